@@ -17,25 +17,62 @@ Features:
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from socketio_instance import socketio
-from routes.auth import user_bp
-from routes.case_route import case_bp
-from routes.simulation_route import simulation_bp
-from routes.report_route import report_bp
-from routes.discussion_route import discussion_bp
-from routes.upload import upload_bp
-from routes.chatbot_route import chatbot_bp
+import atexit
+import fnmatch
+import importlib
+import logging
+import logging.handlers
 import os
+import queue
+import re
+import time
+import threading
+import zlib
 from dotenv import load_dotenv
-from datetime import datetime
+from utils.helper import iso_now
+from db.mongo import test_connection, warm_up as warm_up_mongo
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
 
+# Environment settings never change at runtime, so read them once
+ENV_NAME = os.getenv("ENVIRONMENT", "development")
+IS_PRODUCTION = ENV_NAME == "production"
+JWT_SECRET_CONFIGURED = bool(os.getenv("JWT_SECRET"))
+MONGO_URI_CONFIGURED = bool(os.getenv("MONGO_URI"))
+
+# Start the MongoDB handshake now so it overlaps with blueprint imports
+warm_up_mongo()
+
+# Logging - request threads only enqueue records; a background listener
+# formats them and writes to stdout so workers never contend on the stream.
+logger = logging.getLogger("jurix")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 app = Flask(__name__)
 
+# jsonify() goes through app.json, so this swaps every route onto orjson
+if ORJSON_AVAILABLE:
+    from utils.json_provider import ORJSONProvider
+    app.json = ORJSONProvider(app)
+
 # CORS setup - more explicit configuration
-if os.getenv("ENVIRONMENT") == "production":
-    allowed_origins = os.getenv("ALLOWED_ORIGINS", "").split(",")
+if IS_PRODUCTION:
+    allowed_origins = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "").split(",") if o.strip()]
 else:
     allowed_origins = [
         "http://localhost:5173",
@@ -52,10 +89,20 @@ else:
         "https://fonts.gstatic.com"
     ]
 
-print(f"🔧 Configured CORS origins: {allowed_origins}")
+logger.info("🔧 Configured CORS origins: %s", allowed_origins)
+
+# Exact origins are matched as plain strings; glob entries such as
+# "https://*.app.github.dev" are folded into one precompiled pattern, since
+# Flask-CORS would otherwise treat the "*" as a (broken) regex quantifier.
+_exact_origins = frozenset(o for o in allowed_origins if "*" not in o)
+_wildcard_origins = [o for o in allowed_origins if "*" in o]
+_origin_re = re.compile(
+    "|".join(fnmatch.translate(o) for o in _wildcard_origins), re.IGNORECASE
+) if _wildcard_origins else None
+cors_origins = sorted(_exact_origins) + ([_origin_re] if _origin_re else [])
 
 CORS(app,
-     origins=allowed_origins,
+     origins=cors_origins,
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
      allow_headers=[
          "Content-Type",
@@ -69,10 +116,25 @@ CORS(app,
      ],
      supports_credentials=True,
      expose_headers=["Content-Range", "X-Content-Range"],
-     max_age=3600
+     max_age=86400
 )
 
 
+@app.before_request
+def handle_preflight():
+    """
+    Answer CORS preflight requests before any other middleware runs.
+
+    Flask-CORS attaches the Access-Control-* headers (including Max-Age) in its
+    after_request hook, so returning the default OPTIONS response here skips
+    request logging and blueprint dispatch for preflights entirely.
+    """
+    if request.method == 'OPTIONS':
+        return app.make_default_options_response()
+
+
+# Health probes and favicon pings would otherwise dominate the request log
+_SKIP_LOG_PATHS = frozenset({"/api/health", "/favicon.ico", "/"})
 
 @app.before_request
 def log_request():
@@ -80,53 +142,37 @@ def log_request():
     Log all incoming requests for debugging.
 
     This middleware logs request method, path, and origin for non-static endpoints.
-    Useful for monitoring API usage and debugging.
+    Useful for monitoring API usage and debugging. Liveness/health paths are skipped.
     """
+    if request.path in _SKIP_LOG_PATHS:
+        return
     if request.endpoint and not request.endpoint.startswith('static'):
-        print(f"📥 {request.method} {request.path} - Origin: {request.headers.get('Origin', 'None')}")
+        logger.info("📥 %s %s - Origin: %s", request.method, request.path, request.headers.get('Origin', 'None'))
+
+# Blueprints are imported on demand so that a module with a missing optional
+# dependency (transformers, easyocr, ...) only disables its own routes.
+API_PREFIX = "/api"
+BLUEPRINTS = [
+    ("routes.auth", "user_bp", "Auth"),
+    ("routes.case_route", "case_bp", "Case"),
+    ("routes.simulation_route", "simulation_bp", "Simulation"),
+    ("routes.report_route", "report_bp", "Report"),
+    ("routes.discussion_route", "discussion_bp", "Discussion"),
+    ("routes.upload", "upload_bp", "Upload"),
+    ("routes.chatbot_route", "chatbot_bp", "Chatbot"),
+]
 
 # Register all blueprints with error handling
-try:
-    app.register_blueprint(user_bp, url_prefix="/api")
-    print("✅ Auth routes registered")
-except Exception as e:
-    print(f"❌ Failed to register auth routes: {e}")
-
-try:
-    app.register_blueprint(case_bp, url_prefix="/api")  
-    print("✅ Case routes registered")
-except Exception as e:
-    print(f"❌ Failed to register case routes: {e}")
-
-try:
-    app.register_blueprint(simulation_bp, url_prefix="/api")
-    print("✅ Simulation routes registered") 
-except Exception as e:
-    print(f"❌ Failed to register simulation routes: {e}")
-
-try:
-    app.register_blueprint(report_bp, url_prefix="/api")
-    print("✅ Report routes registered")
-except Exception as e:
-    print(f"❌ Failed to register report routes: {e}")
-
-try:
-    app.register_blueprint(discussion_bp, url_prefix="/api")
-    print("✅ Discussion routes registered")
-except Exception as e:
-    print(f"❌ Failed to register discussion routes: {e}")
-
-try:
-    app.register_blueprint(upload_bp, url_prefix="/api")
-    print("✅ Upload routes registered")
-except Exception as e:
-    print(f"❌ Failed to register upload routes: {e}")
+for module_name, attr, label in BLUEPRINTS:
+    try:
+        module = importlib.import_module(module_name)
+        app.register_blueprint(getattr(module, attr), url_prefix=API_PREFIX)
+        logger.info("✅ %s routes registered", label)
+    except Exception as e:
+        logger.error("❌ Failed to register %s routes: %s", label.lower(), e)
 
-try:
-    app.register_blueprint(chatbot_bp, url_prefix="/api")
-    print("✅ Chatbot routes registered")
-except Exception as e:
-    print(f"❌ Failed to register chatbot routes: {e}")
+# SocketIO is bound at import time so WSGI servers (gunicorn app:app) serve it too
+socketio.init_app(app, cors_allowed_origins="*")
 
 # Root endpoint
 @app.route("/")
@@ -151,37 +197,73 @@ def favicon():
     """
     return '', 204
 
+# Health probe cache - avoids a MongoDB round-trip on every poll
+_HEALTH_TTL = 5.0
+_health_cache = {"ts": 0, "status": None, "msg": None}
+_health_lock = threading.Lock()
+
+def _cached_db_status():
+    """
+    Return the database probe result, refreshing it at most once per TTL.
+
+    Only one thread refreshes an expired entry; concurrent callers reuse the
+    stale value instead of queueing up behind the ping.
+
+    Returns:
+        tuple: (db_status, db_message) as returned by test_connection()
+    """
+    if time.monotonic() - _health_cache["ts"] < _HEALTH_TTL:
+        return _health_cache["status"], _health_cache["msg"]
+
+    if not _health_lock.acquire(blocking=_health_cache["status"] is None):
+        return _health_cache["status"], _health_cache["msg"]
+    try:
+        if time.monotonic() - _health_cache["ts"] >= _HEALTH_TTL:
+            db_status, db_message = test_connection()
+            _health_cache.update(ts=time.monotonic(), status=db_status, msg=db_message)
+        return _health_cache["status"], _health_cache["msg"]
+    finally:
+        _health_lock.release()
+
 # Enhanced health check
 @app.route("/api/health")
 def health_check():
     """
     Enhanced health check endpoint.
 
-    Tests database connection and returns status of various services.
+    Tests database connection (cached for a few seconds) and returns status
+    of various services. Responses carry a weak ETag derived from the service
+    state, so pollers sending If-None-Match get an empty 304 while nothing changes.
 
     Returns:
         JSON: Health status of services, database, environment info, and timestamp
     """
     try:
         # Test database connection
-        from db.mongo import test_connection
-        db_status, db_message = test_connection()
+        db_status, db_message = _cached_db_status()
+
+        etag = f'W/"{zlib.crc32(f"{db_status}|{db_message}|{ENV_NAME}".encode()):x}"'
+        if request.headers.get("If-None-Match") == etag:
+            return "", 304, {"ETag": etag}
         
-        return jsonify({
+        response = jsonify({
             "status": "All systems running!",
             "services": ["auth", "cases", "simulation", "reports", "discussions"],
             "database": {
                 "status": "healthy" if db_status else "unhealthy",
                 "message": db_message
             },
-            "environment": os.getenv('ENVIRONMENT', 'development'),
-            "timestamp": datetime.utcnow().isoformat()
-        }), 200
+            "environment": ENV_NAME,
+            "timestamp": iso_now()
+        })
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = f"max-age={int(_HEALTH_TTL)}"
+        return response, 200
     except Exception as e:
         return jsonify({
             "status": "Partial outage",
             "error": str(e),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": iso_now()
         }), 500
 
 # 404 error handler
@@ -198,7 +280,7 @@ def handle_not_found(error):
     Returns:
         JSON: Error message and status code 404
     """
-    print(f"❌ 404 Not Found: {request.path}")
+    logger.warning("❌ 404 Not Found: %s", request.path)
     return jsonify({
         "error": "Not Found",
         "message": "The requested resource was not found on this server."
@@ -210,8 +292,9 @@ def handle_error(error):
     """
     Global error handler for unhandled exceptions.
 
-    Logs the error with traceback and returns a JSON error response.
-    In production, hides detailed error messages for security.
+    Logs the error and returns a JSON error response. Outside production the
+    traceback is logged too; in production only a one-line summary is logged
+    and detailed error messages are hidden for security.
 
     Args:
         error: The exception object
@@ -219,20 +302,20 @@ def handle_error(error):
     Returns:
         JSON: Error message and status code 500
     """
-    print(f"❌ Unhandled error: {error}")
-    import traceback
-    traceback.print_exc()
+    if not IS_PRODUCTION:
+        logger.error("❌ Unhandled error: %s", error, exc_info=error)
+    else:
+        logger.error("❌ Unhandled error: %s: %s", type(error).__name__, error)
     return jsonify({
         "error": "Internal server error",
-        "message": str(error) if os.getenv("ENVIRONMENT") != "production" else "Something went wrong"
+        "message": str(error) if not IS_PRODUCTION else "Something went wrong"
     }), 500
 
 if __name__ == "__main__":
     print("🚀 Starting Jurix Backend...")
     print(f"🌐 CORS origins: {allowed_origins}")
-    print(f"🔧 Environment: {os.getenv('ENVIRONMENT', 'development')}")
-    print(f"🔑 JWT Secret configured: {'Yes' if os.getenv('JWT_SECRET') else 'No'}")
-    print(f"🗄️ MongoDB URI configured: {'Yes' if os.getenv('MONGO_URI') else 'No'}")
+    print(f"🔧 Environment: {ENV_NAME}")
+    print(f"🔑 JWT Secret configured: {'Yes' if JWT_SECRET_CONFIGURED else 'No'}")
+    print(f"🗄️ MongoDB URI configured: {'Yes' if MONGO_URI_CONFIGURED else 'No'}")
 
-    socketio.init_app(app, cors_allowed_origins="*")
     socketio.run(app, debug=True, host="0.0.0.0", port=5001)
@@ -3,8 +3,18 @@ Critical Fixes Package - Apply These Immediately
 Run: python critical_fixes.py
 """
 
+import ast
+import datetime
+import hashlib
 import os
+import shutil
 import sys
+import textwrap
+
+from jinja2 import Environment, FileSystemLoader
+
+# Files written by add_indexes(), create_performance_monitor() and generate_report()
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_templates')
 
 # Colors for terminal output
 class Colors:
@@ -14,117 +24,182 @@ class Colors:
     BLUE = '\033[94m'
     END = '\033[0m'
 
+_RULE = f"{Colors.BLUE}{'='*60}{Colors.END}"
+_SUCCESS = f"{Colors.GREEN}✅ "
+_WARNING = f"{Colors.YELLOW}⚠️  "
+_ERROR = f"{Colors.RED}❌ "
+_END_NL = f"{Colors.END}\n"
+
 def print_header(text):
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.END}")
-    print(f"{Colors.BLUE}{text.center(60)}{Colors.END}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.END}\n")
+    sys.stdout.write(f"\n{_RULE}\n{Colors.BLUE}{text.center(60)}{Colors.END}\n{_RULE}\n\n")
 
 def print_success(text):
-    print(f"{Colors.GREEN}✅ {text}{Colors.END}")
+    sys.stdout.write(_SUCCESS + text + _END_NL)
 
 def print_warning(text):
-    print(f"{Colors.YELLOW}⚠️  {text}{Colors.END}")
+    sys.stdout.write(_WARNING + text + _END_NL)
 
 def print_error(text):
-    print(f"{Colors.RED}❌ {text}{Colors.END}")
-
-def fix_document_parser():
-    """Fix #1: Disable BLIP-2 on CPU"""
-    print_header("FIX #1: Document Parser CPU Optimization")
-    
-    file_path = "backend/services/parsing/document_parsing_services.py"
-    
-    if not os.path.exists(file_path):
+    sys.stdout.write(_ERROR + text + _END_NL)
+
+def find_method(tree, class_name, method_name):
+    """Return the FunctionDef node for class_name.method_name, or None"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name == method_name:
+                    return item
+    return None
+
+def apply_patches(file_path, patches):
+    """Parse a file once, apply structural patches, and write it once if changed
+    
+    Each patch receives (tree, source) and returns a list of
+    (start_offset, end_offset, replacement) edits against the source text,
+    an empty list if it is already applied, or None if its target is missing.
+    
+    The file is opened once for read and rewrite; FileNotFoundError
+    propagates to the caller.
+    
+    Returns:
+        dict: patch name -> "applied" | "already" | "not_found"
+    """
+    with open(file_path, 'r+', encoding='utf-8') as f:
+        source = f.read()
+        results = _patch_source(f, source, patches)
+    return results
+
+def _patch_source(f, source, patches):
+    """Apply patches to source and rewrite the open file f in place if changed"""
+    original_hash = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    tree = ast.parse(source)
+    line_offsets = [0]
+    for line in source.splitlines(keepends=True):
+        line_offsets.append(line_offsets[-1] + len(line))
+    
+    results = {}
+    edits = []
+    for patch in patches:
+        patch_edits = patch(tree, source, line_offsets)
+        if patch_edits is None:
+            results[patch.__name__] = "not_found"
+        elif not patch_edits:
+            results[patch.__name__] = "already"
+        else:
+            results[patch.__name__] = "applied"
+            edits.extend(patch_edits)
+    
+    # Apply from the end so earlier offsets stay valid
+    for start, end, replacement in sorted(edits, reverse=True):
+        source = source[:start] + replacement + source[end:]
+    
+    if hashlib.sha256(source.encode('utf-8')).hexdigest() != original_hash:
+        ast.parse(source)  # never write a file we broke
+        f.seek(0)
+        f.write(source)
+        f.truncate()
+    
+    return results
+
+def node_span(node, line_offsets):
+    """Source offsets covering a node's full lines, including indentation"""
+    return line_offsets[node.lineno - 1], line_offsets[node.end_lineno]
+
+def patch_parser_cpu_only(tree, source, line_offsets):
+    """Wrap DocumentParser's Gemini setup in a GPU availability check"""
+    init = find_method(tree, "DocumentParser", "__init__")
+    if init is None:
+        return None
+    
+    target = None
+    for stmt in init.body:
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Attribute) and node.attr == "has_gpu" and isinstance(node.ctx, ast.Store):
+                return []
+        if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Attribute)
+                and stmt.targets[0].attr == "gemini_service"):
+            target = stmt
+            break
+    if target is None:
+        return None
+    
+    indent = " " * target.col_offset
+    start, end = node_span(target, line_offsets)
+    # Whole lines keep every line's own indentation, so shifting them all by
+    # one level nests a multi-line assignment correctly under the else:
+    original = textwrap.indent(source[start:end].rstrip('\n'), "    ")
+    replacement = (
+        f"{indent}# Check GPU availability\n"
+        f"{indent}try:\n"
+        f"{indent}    import torch\n"
+        f"{indent}    self.has_gpu = torch.cuda.is_available()\n"
+        f"{indent}except:\n"
+        f"{indent}    self.has_gpu = False\n"
+        f"\n"
+        f"{indent}# Disable heavy models on CPU\n"
+        f"{indent}if not self.has_gpu:\n"
+        f"{indent}    logging.info(\"⚠️ No GPU detected - using CPU-optimized OCR only\")\n"
+        f"{indent}    self.gemini_service = None\n"
+        f"{indent}else:\n"
+        f"{original}\n"
+    )
+    return [(start, end, replacement)]
+
+def patch_mongo_timeout(tree, source, line_offsets):
+    """Set serverSelectionTimeoutMS=5000 on the MongoClient call"""
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == "MongoClient"):
+            for keyword in node.keywords:
+                if keyword.arg == "serverSelectionTimeoutMS":
+                    value = keyword.value
+                    if isinstance(value, ast.Constant) and value.value == 5000:
+                        return []
+                    start = line_offsets[value.lineno - 1] + value.col_offset
+                    end = line_offsets[value.end_lineno - 1] + value.end_col_offset
+                    return [(start, end, "5000")]
+    return None
+
+def run_patch(title, file_path, patch, success_message, details):
+    """Apply one structural patch to a file and report the outcome"""
+    print_header(title)
+    
+    try:
+        status = apply_patches(file_path, [patch])[patch.__name__]
+    except FileNotFoundError:
         print_error(f"File not found: {file_path}")
         return False
-    
-    print("Reading file...")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Check if already fixed
-    if "self.has_gpu = torch.cuda.is_available()" in content:
+    if status == "already":
         print_warning("Already patched! Skipping...")
         return True
-    
-    # Apply fix
-    old_init = '''    def __init__(self):
-        """Initialize the document parser with AI and OCR support"""
-        # Lazy load OCR reader - only initialize when needed
-        self.ocr_reader = None
-        self._ocr_initialized = False
-
-        # Initialize Gemini service for AI-powered text extraction
-        self.gemini_service = GeminiService() if GEMINI_AVAILABLE else None'''
-    
-    new_init = '''    def __init__(self):
-        """Initialize the document parser with AI and OCR support (CPU-optimized)"""
-        # Lazy load OCR reader - only initialize when needed
-        self.ocr_reader = None
-        self._ocr_initialized = False
-
-        # Check GPU availability
-        try:
-            import torch
-            self.has_gpu = torch.cuda.is_available()
-        except:
-            self.has_gpu = False
-        
-        # Disable heavy models on CPU
-        if not self.has_gpu:
-            logging.info("⚠️ No GPU detected - using CPU-optimized OCR only")
-            self.gemini_service = None
-        else:
-            self.gemini_service = GeminiService() if GEMINI_AVAILABLE else None'''
-    
-    if old_init in content:
-        content = content.replace(old_init, new_init)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print_success("Document parser optimized for CPU!")
-        print("  ⚡ Expected speedup: 300s → 3s (100x faster)")
-        return True
-    else:
+    if status == "not_found":
         print_warning("Pattern not found - manual fix needed")
         return False
+    
+    print_success(success_message)
+    print(details)
+    return True
+
+def fix_document_parser():
+    """Fix #1: Disable BLIP-2 on CPU"""
+    return run_patch(
+        "FIX #1: Document Parser CPU Optimization",
+        "backend/services/parsing/document_parsing_services.py",
+        patch_parser_cpu_only,
+        "Document parser optimized for CPU!",
+        "  ⚡ Expected speedup: 300s → 3s (100x faster)"
+    )
 
 def fix_mongodb_timeout():
     """Fix #2: Reduce MongoDB timeout"""
-    print_header("FIX #2: MongoDB Timeout Optimization")
-    
-    file_path = "backend/db/mongo.py"
-    
-    if not os.path.exists(file_path):
-        print_error(f"File not found: {file_path}")
-        return False
-    
-    print("Reading file...")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Check if already fixed
-    if "serverSelectionTimeoutMS=5000" in content:
-        print_warning("Already patched! Skipping...")
-        return True
-    
-    # Apply fix
-    old_timeout = "serverSelectionTimeoutMS=30000"
-    new_timeout = "serverSelectionTimeoutMS=5000"
-    
-    if old_timeout in content:
-        content = content.replace(old_timeout, new_timeout)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print_success("MongoDB timeout reduced!")
-        print("  ⚡ Timeout: 30s → 5s")
-        return True
-    else:
-        print_warning("Pattern not found - manual fix needed")
-        return False
+    return run_patch(
+        "FIX #2: MongoDB Timeout Optimization",
+        "backend/db/mongo.py",
+        patch_mongo_timeout,
+        "MongoDB timeout reduced!",
+        "  ⚡ Timeout: 30s → 5s"
+    )
 
 def fix_agent_memory_leak():
     """Fix #3: Add agent memory cleanup"""
@@ -132,28 +207,31 @@ def fix_agent_memory_leak():
     
     file_path = "backend/routes/simulation_route.py"
     
-    if not os.path.exists(file_path):
+    print("Reading file...")
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+    except FileNotFoundError:
         print_error(f"File not found: {file_path}")
         return False
     
-    print("Reading file...")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Check if already fixed
-    if "prosecutor.clear_memory()" in content and "gc.collect()" in content:
-        print_warning("Already patched! Skipping...")
-        return True
-    
     # Find the function
-    search_pattern = "def run_agent_simulation"
-    if search_pattern not in content:
+    func = next((node for node in ast.walk(tree)
+                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                 and node.name == "run_agent_simulation"), None)
+    if func is None:
         print_error("run_agent_simulation function not found")
         return False
     
-    # Check if cleanup already exists
-    if "# Clear agent memory" in content:
-        print_warning("Cleanup code already exists")
+    # Check if already fixed (cleanup calls anywhere in the function body)
+    called = {
+        (node.func.value.id, node.func.attr)
+        for node in ast.walk(func)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+    }
+    if ("prosecutor", "clear_memory") in called and ("gc", "collect") in called:
+        print_warning("Already patched! Skipping...")
         return True
     
     print_success("Needs manual addition - see instructions below")
@@ -176,53 +254,7 @@ def add_indexes():
     
     print("Creating index setup script...")
     
-    index_script = '''"""
-Database Index Setup - Run this once
-python setup_indexes.py
-"""
-
-from db.mongo import get_db
-
-def setup_indexes():
-    """Create indexes for better query performance"""
-    db = get_db()
-    
-    print("Creating indexes...")
-    
-    # Cases collection
-    cases = db['cases']
-    cases.create_index([("user_id", 1), ("created_at", -1)])
-    cases.create_index([("case_id", 1)], unique=True)
-    cases.create_index([("is_public", 1), ("created_at", -1)])
-    cases.create_index([("status", 1)])
-    print("✅ Cases indexes created")
-    
-    # Evidence collection
-    evidence = db['evidence']
-    evidence.create_index([("case_id", 1)])
-    evidence.create_index([("uploaded_at", -1)])
-    print("✅ Evidence indexes created")
-    
-    # Users collection
-    users = db['users']
-    users.create_index([("email", 1)], unique=True)
-    users.create_index([("created_at", -1)])
-    print("✅ User indexes created")
-    
-    # Discussions collection
-    discussions = db['discussions']
-    discussions.create_index([("case_id", 1), ("created_at", -1)])
-    discussions.create_index([("user_id", 1)])
-    print("✅ Discussion indexes created")
-    
-    print("\n🎉 All indexes created successfully!")
-
-if __name__ == "__main__":
-    setup_indexes()
-'''
-    
-    with open('backend/setup_indexes.py', 'w', encoding='utf-8') as f:
-        f.write(index_script)
+    shutil.copyfile(os.path.join(TEMPLATES_DIR, 'setup_indexes.py.tmpl'), 'backend/setup_indexes.py')
     
     print_success("Index setup script created: backend/setup_indexes.py")
     print("  📝 Run: python backend/setup_indexes.py")
@@ -233,49 +265,8 @@ def create_performance_monitor():
     """Fix #5: Add performance monitoring decorator"""
     print_header("FIX #5: Performance Monitoring")
     
-    monitor_code = '''"""
-Performance Monitoring Utilities
-"""
-
-import time
-import logging
-from functools import wraps
-
-def track_performance(func):
-    """Decorator to track function performance"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        func_name = func.__name__
-        
-        try:
-            result = func(*args, **kwargs)
-            duration = time.time() - start
-            
-            # Log slow operations
-            if duration > 5.0:
-                logging.warning(f"⚠️ SLOW: {func_name} took {duration:.2f}s")
-            else:
-                logging.info(f"✅ {func_name} completed in {duration:.2f}s")
-            
-            return result
-        except Exception as e:
-            duration = time.time() - start
-            logging.error(f"❌ ERROR in {func_name} after {duration:.2f}s: {e}")
-            raise
-    return wrapper
-
-# Usage example:
-# from utils.performance import track_performance
-#
-# @track_performance
-# def your_slow_function():
-#     # ... code ...
-'''
-    
     os.makedirs('backend/utils', exist_ok=True)
-    with open('backend/utils/performance.py', 'w', encoding='utf-8') as f:
-        f.write(monitor_code)
+    shutil.copyfile(os.path.join(TEMPLATES_DIR, 'performance.py.tmpl'), 'backend/utils/performance.py')
     
     print_success("Performance monitor created: backend/utils/performance.py")
     print("  📝 Import and use @track_performance decorator")
@@ -306,58 +297,18 @@ def check_dependencies():
     
     return len(missing) == 0
 
-def generate_report():
-    """Generate optimization report"""
+def generate_report(results):
+    """Generate optimization report from the fix results"""
     print_header("Optimization Report Generated")
     
-    report = """
-# Backend Optimization Report
-
-## Applied Fixes
-
-### ✅ Fix #2: MongoDB Timeout Optimization
-- **Issue**: 30s timeout causing slow failures
-- **Fix**: Reduced to 5s for faster failure detection
-- **Impact**: Better user experience, faster error recovery
-
-### ✅ Fix #3: Agent Memory Cleanup
-- **Issue**: Memory leaks from simulation agents
-- **Fix**: Added explicit cleanup and garbage collection
-- **Impact**: Stable memory usage (2GB → 500MB)
-
-### ✅ Fix #4: Database Indexes
-- **Issue**: Slow queries on large datasets
-- **Fix**: Added indexes on common query patterns
-- **Impact**: 10-16x faster database queries
-
-### ✅ Fix #5: Performance Monitoring
-- **Issue**: No visibility into slow operations
-- **Fix**: Added performance tracking decorator
-- **Impact**: Easy identification of bottlenecks
-
-## Performance Improvements
-
-| Metric | Before | After | Improvement |
-|--------|--------|-------|-------------|
-| Evidence upload | 60s | 5s | 12x faster |
-| DB queries | 5s | 0.3s | 16x faster |
-| Memory usage | 2GB | 500MB | 4x reduction |
-
-## Next Steps
-
-1. **Immediate**: Apply all fixes
-2. **This week**: Add response caching
-3. **This month**: Implement parallel processing
-4. **Next quarter**: Add comprehensive testing
-
-## Monitoring Recommendations
-
-- Add Sentry for error tracking
-- Use Redis for distributed caching
-- Implement health check endpoints
-- Add load testing with Locust
-
-"""
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        auto_reload=False,
+        cache_size=-1,
+        keep_trailing_newline=True,
+    )
+    template = env.get_template('optimization_report.md.j2')
+    report = template.render(results=results, now=datetime.datetime.utcnow())
     
     with open('OPTIMIZATION_REPORT.md', 'w', encoding='utf-8') as f:
         f.write(report)
@@ -384,6 +335,7 @@ def main():
     if not os.path.exists('backend'):
         print_error("backend/ directory not found!")
         print("Please run this script from the project root directory.")
+        sys.stdout.flush()
         sys.exit(1)
     
     print_success("Found backend/ directory\n")
@@ -396,8 +348,8 @@ def main():
         "Agent Cleanup": fix_agent_memory_leak(),
         "Database Indexes": add_indexes(),
         "Performance Monitor": create_performance_monitor(),
-        "Report": generate_report()
     }
+    results["Report"] = generate_report(results)
     
     # Summary
     print_header("SUMMARY")
@@ -425,6 +377,7 @@ def main():
     print("3. 🧪 Test evidence upload (should be 10x faster)")
     print("4. 📝 Review OPTIMIZATION_REPORT.md for full details")
     print("5. 🚀 Deploy to production\n")
+    sys.stdout.flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,58 @@
+"""
+Index definitions, ensured at startup and by setup_indexes.py
+
+Compound indexes follow the Equality -> Sort -> Range rule: fields matched
+by equality come first, then the field the query sorts on.
+"""
+
+import logging
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger("db.indexes")
+
+INDEXES = {
+    "cases": [
+        IndexModel([("case_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),  # keyset pagination
+        IndexModel([("is_public", ASCENDING), ("published_at", DESCENDING)]),  # featured feed
+    ],
+    "evidence": [
+        IndexModel([("case_id", ASCENDING), ("uploaded_at", DESCENDING)]),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "discussions": [
+        IndexModel([("case_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("parent_id", ASCENDING)]),
+    ],
+}
+
+# Indexes made redundant by a compound index above (dropped by setup_indexes.py)
+REDUNDANT_INDEXES = {
+    "cases": ["status_1", "is_public_1_created_at_-1"],
+    "evidence": ["case_id_1"],
+}
+
+def ensure_indexes(database):
+    """Create any missing indexes, one createIndexes command per collection
+
+    Existing indexes with the same spec are left alone, so this is cheap to
+    run on every boot.
+
+    Returns:
+        bool: True if every collection's indexes are in place
+    """
+    ok = True
+    for name, indexes in INDEXES.items():
+        try:
+            database[name].create_indexes(indexes)
+        except PyMongoError as e:
+            logger.warning("⚠️ Could not ensure indexes on %s: %s", name, e)
+            ok = False
+    return ok
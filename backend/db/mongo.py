@@ -1,9 +1,15 @@
 import os
 import logging
+import threading
 import certifi
-from pymongo import MongoClient
+from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+from pymongo import MongoClient, monitoring
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from pymongo.server_api import ServerApi
+from pymongo.read_preferences import ReadPreference
+from pymongo.read_concern import ReadConcern
+from db.indexes import ensure_indexes
 from dotenv import load_dotenv
 
 # ------------------------------
@@ -23,19 +29,89 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("db.mongo")
 
 # ------------------------------
-# Initialize MongoDB client
+# MongoDB client (created lazily on first use)
 # ------------------------------
 client = None
 db = None
+secondary_db = None  # Same database, reads routed to secondaries when available
+_init_lock = threading.Lock()
+
+class ObjectIdToStr(TypeDecoder):
+    """Decode ObjectId values straight to their hex string"""
+    bson_type = ObjectId
+
+    def transform_bson(self, value):
+        return str(value)
+
+# Documents read with these options are JSON-ready: every ObjectId is a str
+STR_ID_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([ObjectIdToStr()]))
+_str_id_collections = {}  # (name, secondary) -> collection using STR_ID_CODEC_OPTIONS
+
+# MongoDB 8.0 (wire version 25) is the first server with the bulkWrite command
+CLIENT_BULK_WRITE_MIN_WIRE_VERSION = 25
+_client_bulk_supported = None  # decided once from the server's wire version
+
+SLOW_COMMAND_MS = int(os.getenv("MONGO_SLOW_COMMAND_MS", "500"))
+
+class PoolMonitor(monitoring.ConnectionPoolListener, monitoring.CommandListener):
+    """Log pool exhaustion and slow commands (everything else is a no-op)"""
+
+    def connection_check_out_failed(self, event):
+        logger.warning("⚠️ MongoDB connection checkout failed (%s) on %s", event.reason, event.address)
+
+    def pool_cleared(self, event):
+        logger.warning("⚠️ MongoDB connection pool cleared for %s", event.address)
+
+    def succeeded(self, event):
+        if event.duration_micros >= SLOW_COMMAND_MS * 1000:
+            logger.warning("⚠️ Slow MongoDB %s: %.0fms", event.command_name, event.duration_micros / 1000)
+
+    def failed(self, event):
+        logger.warning("⚠️ MongoDB %s failed after %.0fms: %s", event.command_name, event.duration_micros / 1000, event.failure)
+
+    # Events the monitor does not need
+    def started(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
 
 def init_mongo_client(max_retries=3, retry_delay=5):
     """Initialize MongoDB client with retries and exponential backoff
+
+    The client is created with connect=False, so no connection is opened
+    here; server problems surface on the first real operation (or in
+    warm_up()) instead.
     
     Args:
         max_retries (int): Maximum number of connection attempts
         retry_delay (int): Initial delay between retries in seconds
     """
-    global client, db
+    global client, db, secondary_db
     
     attempt = 0
     last_error = None
@@ -47,27 +123,34 @@ def init_mongo_client(max_retries=3, retry_delay=5):
             # Initialize MongoDB client with robust settings
             client = MongoClient(
                 MONGO_URI,
+                connect=False,                   # Connect on first operation / warm_up()
                 server_api=ServerApi("1"),
                 tlsCAFile=certifi.where(),       # certifi CA bundle for SSL
                 serverSelectionTimeoutMS=5000,  # 30s timeout
                 connectTimeoutMS=30000,
                 socketTimeoutMS=30000,
-                maxPoolSize=50,
+                maxPoolSize=200,
+                minPoolSize=10,                # Keep warm connections for bursts
+                maxIdleTimeMS=300000,          # Keep idle connections for 5 min to avoid re-handshakes
+                compressors="zstd,zlib",       # Compress large evidence/discussion docs on the wire
+                zlibCompressionLevel=6,
+                appname="jurix-backend",
                 retryWrites=True,
                 w="majority",
-                waitQueueTimeoutMS=10000,      # Wait queue timeout
+                waitQueueTimeoutMS=2000,       # Fail fast when the pool is exhausted
+                event_listeners=[PoolMonitor()],
                 replicaSet=os.getenv("MONGO_REPLICA_SET"),  # Optional replica set
                 readPreference="primaryPreferred"  # Read from primary if available
             )
 
-            # Test the connection with retry
-            client.admin.command("ping")
-            db = client[DB_NAME]
-            
-            # Verify database access
-            db.list_collection_names()
+            secondary_db = client.get_database(
+                DB_NAME,
+                read_preference=ReadPreference.SECONDARY_PREFERRED,
+                read_concern=ReadConcern("local")
+            )
+            db = client[DB_NAME]  # Set last: other threads treat it as "ready"
             
-            logger.info(f"✅ Successfully connected to MongoDB: {DB_NAME}")
+            logger.info("✅ MongoDB client initialized: %s", DB_NAME)
             return True
             
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
@@ -90,69 +173,115 @@ def init_mongo_client(max_retries=3, retry_delay=5):
     logger.error(f"❌ Failed to connect to MongoDB after {max_retries} attempts: {last_error}")
     client = None
     db = None
+    secondary_db = None
     return False
 
-# Initialize connection with retries
-init_mongo_client()
+def _ensure_db():
+    """Create the client on first use (double-checked so only one thread connects)"""
+    if db is None:
+        with _init_lock:
+            if db is None:
+                init_mongo_client()
+    return db
 
-# ------------------------------
-# Default collections
-# ------------------------------
-case_collection = db["cases"] if db is not None else None
-user_collection = db["users"] if db is not None else None
-evidence_collection = db["evidence"] if db is not None else None
+def warm_up():
+    """Create the client, open its first connection and ensure indexes in a daemon thread
+
+    Lets the TLS/auth handshake overlap with the rest of application startup;
+    callers that need the database before it finishes wait on _init_lock.
+    """
+    def _connect():
+        try:
+            if _ensure_db() is not None:
+                client.admin.command("ping")
+                logger.info("✅ MongoDB connection warmed up")
+                if ensure_indexes(db):
+                    logger.info("✅ MongoDB indexes ensured")
+        except Exception as e:
+            logger.warning("⚠️ MongoDB warm-up failed: %s", e)
+
+    threading.Thread(target=_connect, name="mongo-warmup", daemon=True).start()
 
 # ------------------------------
 # Collection getters with reconnection
 # ------------------------------
 def get_case_collection():
-    """Get case collection with connection retry"""
-    global db, case_collection
-    if case_collection is None:
-        if db is None:
-            init_mongo_client()
-        if db is not None:
-            case_collection = db["cases"]
-    return case_collection
+    """Get case collection with connection retry (ObjectIds decode to str)"""
+    database = _ensure_db()
+    return get_collection("cases", str_ids=True) if database is not None else None
 
 def get_user_collection():
     """Get user collection with connection retry"""
-    global db, user_collection
-    if user_collection is None:
-        if db is None:
-            init_mongo_client()
-        if db is not None:
-            user_collection = db["users"]
-    return user_collection
+    database = _ensure_db()
+    return database["users"] if database is not None else None
 
 def get_evidence_collection():
-    """Get evidence collection with connection retry"""
-    global db, evidence_collection
-    if evidence_collection is None:
-        if db is None:
-            init_mongo_client()
-        if db is not None:
-            evidence_collection = db["evidence"]
-    return evidence_collection
+    """Get evidence collection with connection retry (ObjectIds decode to str)"""
+    database = _ensure_db()
+    return get_collection("evidence", str_ids=True) if database is not None else None
 
 # ------------------------------
 # Helper functions
 # ------------------------------
 def get_db():
     """Return the active database instance."""
-    if db is None:
+    database = _ensure_db()
+    if database is None:
         raise ConnectionError("Database connection not available")
-    return db
+    return database
 
-def get_collection(name: str):
-    """Return a collection by name."""
-    if db is None:
+def get_secondary_db():
+    """Return the database handle that prefers secondaries for reads.
+
+    Use it for list/feed queries that tolerate slightly stale data; never for
+    read-after-write paths.
+    """
+    _ensure_db()
+    if secondary_db is None:
         raise ConnectionError("Database connection not available")
-    return db[name]
+    return secondary_db
+
+def get_collection(name: str, *, secondary: bool = False, str_ids: bool = False):
+    """Return a collection by name, optionally from the secondary-read handle.
+
+    With str_ids=True, ObjectIds in returned documents are decoded as strings
+    during BSON parsing (queries may still pass ObjectId values).
+    """
+    database = get_secondary_db() if secondary else get_db()
+    if not str_ids:
+        return database[name]
+    collection = _str_id_collections.get((name, secondary))
+    if collection is None:
+        collection = database[name].with_options(codec_options=STR_ID_CODEC_OPTIONS)
+        _str_id_collections[(name, secondary)] = collection
+    return collection
+
+def bulk_write_mixed(name: str, build_ops, ordered: bool = False):
+    """Send mixed insert/update ops on one collection in as few round-trips as possible
+
+    build_ops(namespace) must return the write models, passing `namespace`
+    through to each one. MongoDB 8.0+ receives them as a single bulkWrite
+    command; older servers get Collection.bulk_write (one command per op type).
+    """
+    database = get_db()
+    if _supports_client_bulk_write():
+        return client.bulk_write(build_ops(f"{database.name}.{name}"), ordered=ordered)
+    return database[name].bulk_write(build_ops(None), ordered=ordered)
+
+def _supports_client_bulk_write():
+    """Whether the primary speaks MongoDB 8.0's bulkWrite (one hello, then cached)"""
+    global _client_bulk_supported
+    if _client_bulk_supported is None:
+        wire_version = get_db().command("hello").get("maxWireVersion", 0)
+        _client_bulk_supported = wire_version >= CLIENT_BULK_WRITE_MIN_WIRE_VERSION
+        if not _client_bulk_supported:
+            logger.info("MongoDB server predates 8.0; using per-collection bulk writes")
+    return _client_bulk_supported
 
 def test_connection():
     """Test database connection and return status."""
     try:
+        _ensure_db()
         if client is not None:
             client.admin.command("ping")
             return True, "MongoDB connection successful!"
@@ -1,34 +1,96 @@
 from functools import wraps
 from flask import request, jsonify
-from model.user import get_user_by_id
+import hashlib
+import time
+from model.user import get_user_role
 from utils.jwt_utils import verify_token   # ✅ no circular import
+from utils.cache import TTLCache
+from middleware.rate_limiter import rate_limiter
 
-def require_auth(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get('Authorization')
+# Verified token payloads, keyed by a digest so raw JWTs are not kept in memory
+TOKEN_CACHE_TTL = 60
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+
+# Roles of users whose tokens predate the 'role' claim
+_role_cache = TTLCache(maxsize=5000, ttl=300)
+
+def verify_token_cached(token):
+    """Verify a JWT, reusing the decoded payload for repeat requests"""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _token_cache.get(key)
+    now = time.time()
+    if payload is not None:
+        if payload.get('exp', now + 1) > now:
+            return payload
+        _token_cache.pop(key)
+        return None
 
-        if auth_header:
-            try:
-                token = auth_header.split(' ')[1]
-            except IndexError:
-                return jsonify({'error': 'Invalid token format'}), 401
+    payload = verify_token(token)
+    if payload:
+        # Never cache a token past its own expiry
+        ttl = min(TOKEN_CACHE_TTL, payload.get('exp', now + TOKEN_CACHE_TTL) - now)
+        _token_cache.set(key, payload, ttl=ttl)
+    return payload
 
-        if not token:
-            return jsonify({'error': 'Authentication token is required'}), 401
+def _authenticate():
+    """Parse and verify the bearer token, attaching user info to the request
+    
+    Returns:
+        tuple: (payload, None) on success, (None, error response) otherwise
+    """
+    auth_header = request.headers.get('Authorization')
+    if auth_header and not auth_header.startswith('Bearer '):
+        return None, (jsonify({'error': 'Invalid token format'}), 401)
 
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Invalid or expired token'}), 401
+    token = auth_header[7:] if auth_header else None
+    if not token:
+        return None, (jsonify({'error': 'Authentication token is required'}), 401)
 
-        # Attach user info to request
-        request.current_user_id = payload.get('user_id')
-        request.current_user_email = payload.get('email')
+    payload = verify_token_cached(token)
+    if not payload:
+        return None, (jsonify({'error': 'Invalid or expired token'}), 401)
+
+    # Attach user info to request
+    request.current_user_id = payload.get('user_id')
+    request.current_user_email = payload.get('email')
+    request.current_user_role = payload.get('role')
+    return payload, None
+
+def require_auth(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        _, error = _authenticate()
+        if error:
+            return error
 
         return f(*args, **kwargs)
     return decorated_function
 
+def auth_rate_limit(limit: int = 100, window: int = 3600):
+    """
+    require_auth + rate_limit(per='user') in one decorator, so the token is
+    parsed and verified once per request
+    
+    Args:
+        limit: Number of requests allowed
+        window: Time window in seconds
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            _, error = _authenticate()
+            if error:
+                return error
+
+            if not rate_limiter.is_allowed(request.current_user_id, limit, window):
+                return jsonify({
+                    'error': 'Rate limit exceeded',
+                    'message': f'Too many requests. Limit: {limit} per {window} seconds'
+                }), 429
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
 
 def require_role(required_role):
     def decorator(f):
@@ -37,8 +99,15 @@ def require_role(required_role):
             if not hasattr(request, 'current_user_id'):
                 return jsonify({'error': 'Authentication required'}), 401
 
-            user = get_user_by_id(request.current_user_id)
-            if not user or user.get('role') != required_role:
+            role = getattr(request, 'current_user_role', None)
+            if role is None:
+                role = _role_cache.get(request.current_user_id)
+                if role is None:
+                    role = get_user_role(request.current_user_id)
+                    if role is not None:
+                        _role_cache.set(request.current_user_id, role)
+
+            if role != required_role:
                 return jsonify({'error': f'Role {required_role} required'}), 403
 
             return f(*args, **kwargs)
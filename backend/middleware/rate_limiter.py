@@ -1,35 +1,103 @@
 from functools import wraps
 from flask import request, jsonify
+import os
 import time
-from collections import defaultdict, deque
 import threading
+import logging
+
+# Redis is optional - without it each worker process keeps its own counters
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+logger = logging.getLogger("jurix.rate_limiter")
 
 class RateLimiter:
-    """Simple in-memory rate limiter"""
+    """Simple in-memory fixed-window rate limiter
+    
+    Keys are spread over independently locked shards, and each (key, window)
+    only stores its current (window bucket, request count), so a check is O(1).
+    """
+    
+    SHARD_COUNT = 64  # must be a power of two
+    SWEEP_INTERVAL = 1024  # calls per shard between stale-entry sweeps
     
     def __init__(self):
-        self.requests = defaultdict(deque)
-        self.lock = threading.Lock()
+        self.shards = [({}, threading.Lock()) for _ in range(self.SHARD_COUNT)]
+        self.calls = [0] * self.SHARD_COUNT
     
     def is_allowed(self, key: str, limit: int, window: int) -> bool:
         """Check if request is allowed based on rate limit"""
-        with self.lock:
-            now = time.time()
+        slot = (key, window)
+        index = hash(slot) & (self.SHARD_COUNT - 1)
+        counters, lock = self.shards[index]
+        now = time.monotonic()
+        bucket = int(now // window)
+        
+        with lock:
+            self.calls[index] += 1
+            if self.calls[index] >= self.SWEEP_INTERVAL:
+                self.calls[index] = 0
+                self._sweep(counters, now)
             
-            # Clean old requests outside the window
-            while self.requests[key] and self.requests[key][0] <= now - window:
-                self.requests[key].popleft()
+            current_bucket, count = counters.get(slot, (bucket, 0))
+            if current_bucket != bucket:
+                count = 0
             
             # Check if limit exceeded
-            if len(self.requests[key]) >= limit:
+            if count >= limit:
                 return False
             
-            # Add current request
-            self.requests[key].append(now)
+            # Count current request
+            counters[slot] = (bucket, count + 1)
             return True
+    
+    @staticmethod
+    def _sweep(counters, now):
+        """Drop counters whose window has already ended"""
+        stale = [slot for slot, (bucket, _) in counters.items() if (bucket + 1) * slot[1] <= now]
+        for slot in stale:
+            del counters[slot]
+
+class RedisRateLimiter:
+    """Fixed-window rate limiter shared by all workers through Redis
+    
+    Each (key, window, bucket) maps to one Redis counter that is incremented
+    and given an expiry in a single pipelined round-trip.
+    """
+    
+    def __init__(self, url: str, fallback: RateLimiter = None):
+        self.pool = redis.ConnectionPool.from_url(url, max_connections=50)
+        self.redis = redis.Redis(connection_pool=self.pool)
+        self.fallback = fallback or RateLimiter()
+    
+    def is_allowed(self, key: str, limit: int, window: int) -> bool:
+        """Check if request is allowed based on rate limit"""
+        # Wall-clock buckets, so every worker sharing Redis agrees on the window
+        bucket = int(time.time() // window)
+        bucket_key = f"rl:{key}:{window}:{bucket}"
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.incr(bucket_key)
+            pipe.expire(bucket_key, window)
+            count, _ = pipe.execute()
+            return count <= limit
+        except redis.RedisError as e:
+            logger.warning("Redis rate limiting unavailable, using in-memory limiter: %s", e)
+            return self.fallback.is_allowed(key, limit, window)
+
+def create_rate_limiter():
+    """Use Redis when configured and installed, otherwise the in-memory limiter"""
+    if REDIS_AVAILABLE and REDIS_URL:
+        return RedisRateLimiter(REDIS_URL)
+    return RateLimiter()
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter()
 
 def rate_limit(limit: int = 100, window: int = 3600, per: str = 'ip'):
     """
@@ -47,12 +115,13 @@ def rate_limit(limit: int = 100, window: int = 3600, per: str = 'ip'):
             if per == 'ip':
                 key = request.remote_addr
             elif per == 'user':
-                # Try to get user from token
+                # Try to get user from token; the verified payload is cached,
+                # so require_auth on the same request does not verify it again
                 auth_header = request.headers.get('Authorization')
                 if auth_header and auth_header.startswith('Bearer '):
-                    from utils.jwt_utils import verify_token
-                    token = auth_header.split(' ')[1]
-                    payload = verify_token(token)
+                    from middleware.auth_middleware import verify_token_cached
+                    token = auth_header[7:]
+                    payload = verify_token_cached(token)
                     key = payload.get('user_id') if payload else request.remote_addr
                 else:
                     key = request.remote_addr
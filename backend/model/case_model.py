@@ -1,31 +1,122 @@
-from db.mongo import get_case_collection
+import logging
+from db.mongo import get_collection
 from bson import ObjectId
-from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import ExecutionTimeout, PyMongoError
+from datetime import datetime, timezone
+from utils.cache import TTLCache, ttl_cache
+from utils.helper import encode_cursor, decode_cursor
+
+logger = logging.getLogger("jurix.models")
+
+# Fields returned by list queries unless the caller asks for others
+CASE_LIST_FIELDS = [
+    "case_id", "title", "description", "case_type", "status",
+    "created_at", "updated_at", "user_id", "is_public",
+]
+
+# Default list projection, built once; cards only need to know whether a
+# simulation exists, so the results are reduced to a flag
+_CASE_LIST_PROJECTION = {
+    **{field: 1 for field in CASE_LIST_FIELDS},
+    'simulation_results': {'$toBool': {'$ifNull': ['$simulation_results', False]}},
+}
+
+# Documents per getMore when streaming large result sets
+STREAM_BATCH_SIZE = 200
+
+# Public feed filter and author fields joined onto public cases
+_PUBLIC_CASES_FILTER = {'is_public': True}
+# ✅ FIX: Join author name/avatar in the same aggregation (one round trip,
+# served by the users _id index). user_id is stored as a string; a malformed
+# one converts to null instead of failing the whole pipeline.
+_AUTHOR_LOOKUP_STAGES = (
+    {'$addFields': {
+        'userObjectId': {'$convert': {'input': '$user_id', 'to': 'objectId', 'onError': None, 'onNull': None}}
+    }},
+    {'$lookup': {
+        'from': 'users',
+        'localField': 'userObjectId',
+        'foreignField': '_id',
+        'as': 'userDetails'
+    }},
+    {'$unwind': {'path': '$userDetails', 'preserveNullAndEmptyArrays': True}},
+    {'$addFields': {'user': {'name': '$userDetails.name', 'avatarUrl': '$userDetails.avatar'}}},
+    {'$project': {'userDetails': 0, 'userObjectId': 0}},
+)
+
+# Featured cases are public cases that have simulation results; the summary
+# only needs a few fields of the (potentially large) results, and only enough
+# of the description to know whether it has to be shortened
+FEATURED_DESCRIPTION_LENGTH = 200
+_FEATURED_CASES_FILTER = {
+    'is_public': True,
+    'simulation_results': {'$exists': True, '$nin': [None, {}]},
+}
+_FEATURED_CASE_PROJECTION = {
+    'case_id': 1, 'title': 1, 'case_type': 1,
+    'description': {'$substrCP': [{'$ifNull': ['$description', '']}, 0, FEATURED_DESCRIPTION_LENGTH + 1]},
+    'parties': 1, 'published_at': 1,
+    'simulation_results.evidence_analyzed': 1,
+    'simulation_results.simulation_type': 1,
+    'simulation_results.generated_at': 1,
+}
+
+def _list_projection(fields):
+    """Projection for list queries (the shared default unless fields are given)"""
+    if not fields:
+        return _CASE_LIST_PROJECTION
+    return {field: 1 for field in fields}
+
+# Filtered listing totals, keyed by the filter query
+_count_cache = TTLCache(maxsize=1024, ttl=60)
+
+def _clear_list_caches():
+    """Drop cached listings and totals after a case write"""
+    get_all_cases.cache_clear()
+    _count_cache.clear()
+
+def _count_cases(collection, query):
+    """Total number of cases matching query, without a full count when avoidable"""
+    if not query:
+        return collection.estimated_document_count()
+    
+    # Queries may nest operator dicts, so key on their (stable) repr
+    key = repr(sorted(query.items()))
+    total = _count_cache.get(key)
+    if total is None:
+        try:
+            total = collection.count_documents(query, maxTimeMS=500)
+        except ExecutionTimeout:
+            # Too slow to count exactly; the collection size is an upper bound
+            return collection.estimated_document_count()
+        _count_cache.set(key, total)
+    return total
 
 def create_case(case_data):
     """Creates a new case in the database"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    collection = get_collection("cases", str_ids=True)
     try:
         # Add timestamp if not provided
-        if 'created_at' not in case_data:
-            case_data['created_at'] = datetime.utcnow()
-        if 'updated_at' not in case_data:
-            case_data['updated_at'] = datetime.utcnow()
+        now = datetime.now(timezone.utc)
+        case_data.setdefault('created_at', now)
+        case_data.setdefault('updated_at', now)
 
         result = collection.insert_one(case_data)
-        print(f"✅ Case created with ID: {result.inserted_id}")
+        _clear_list_caches()
+        logger.info("✅ Case created with ID: %s", result.inserted_id)
         return str(result.inserted_id)
     except Exception as e:
-        print(f"❌ Error saving case: {str(e)}")
+        logger.error("❌ Error saving case: %s", e)
         raise e
 
-def get_case_by_id(case_id):
+def get_case_by_id(case_id, fields=None):
     """Retrieve a case by its case_id with enhanced error handling and validation
     
     Args:
         case_id (str): The ID of the case to retrieve
+        fields (list, optional): Fields to return (dotted paths allowed);
+            the whole document by default
         
     Returns:
         dict: The case document with serialized IDs, or None if not found
@@ -38,59 +129,53 @@ def get_case_by_id(case_id):
     if not case_id:
         raise ValueError("Case ID cannot be empty")
         
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    collection = get_collection("cases", str_ids=True)
         
     try:
         # Add request logging
-        print(f"🔍 Attempting to retrieve case: {case_id}")
+        logger.debug("🔍 Attempting to retrieve case: %s", case_id)
         
-        # Query with timeout
-        case = collection.find_one(
+        # Fetch and stamp last accessed time in one round-trip
+        case = collection.find_one_and_update(
             {"case_id": case_id},
+            {"$set": {"last_accessed": datetime.now(timezone.utc)}},
+            projection={field: 1 for field in fields} if fields else None,
+            return_document=ReturnDocument.AFTER,
             max_time_ms=5000  # 5 second timeout
         )
         
         if case:
-            # Convert ObjectId to string for JSON serialization
-            case['_id'] = str(case['_id'])
-            
             # Validate required fields
             required_fields = ['case_id', 'title', 'status']
             missing_fields = [field for field in required_fields if field not in case]
             
             if missing_fields:
-                print(f"⚠️ Case {case_id} is missing required fields: {missing_fields}")
+                logger.warning("⚠️ Case %s is missing required fields: %s", case_id, missing_fields)
             
-            print(f"✅ Case found: {case_id} (status: {case.get('status', 'unknown')})")
-            
-            # Add last accessed timestamp
-            collection.update_one(
-                {"case_id": case_id},
-                {"$set": {"last_accessed": datetime.utcnow()}}
-            )
+            logger.debug("✅ Case found: %s (status: %s)", case_id, case.get('status', 'unknown'))
             
             return case
         else:
-            print(f"⚠️ Case not found: {case_id}")
+            logger.warning("⚠️ Case not found: %s", case_id)
             return None
             
+    except PyMongoError as e:
+        # Keep the driver's exception (code/details) for callers that inspect it
+        logger.error("❌ Error retrieving case %s: %s", case_id, e)
+        raise
     except Exception as e:
         error_msg = f"❌ Error retrieving case {case_id}: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         
         # Re-raise with additional context
-        raise type(e)(f"{error_msg} (original error: {str(e)})")
+        raise RuntimeError(error_msg) from e
 
 def update_case(case_id, update_data):
     """Update a case"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    collection = get_collection("cases", str_ids=True)
     try:
         # Always update the timestamp
-        update_data['updated_at'] = datetime.utcnow()
+        update_data['updated_at'] = datetime.now(timezone.utc)
         
         result = collection.update_one(
             {"case_id": case_id},
@@ -99,74 +184,89 @@ def update_case(case_id, update_data):
         
         success = result.modified_count > 0
         if success:
-            print(f"✅ Case updated: {case_id}")
+            _clear_list_caches()
+            logger.info("✅ Case updated: %s", case_id)
         else:
-            print(f"⚠️ No changes made to case: {case_id}")
+            logger.warning("⚠️ No changes made to case: %s", case_id)
         return success
     except Exception as e:
-        print(f"❌ Error updating case: {str(e)}")
+        logger.error("❌ Error updating case: %s", e)
         raise e
 
-def get_cases_by_user_id(user_id):
-    """Get all cases created by a specific user"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+def iter_cases_by_user_id(user_id, fields=None, public_only=False):
+    """Yield a user's cases (optionally only published ones), fetched from
+    MongoDB STREAM_BATCH_SIZE at a time"""
+    collection = get_collection("cases", str_ids=True)
+    query = {"user_id": user_id}
+    if public_only:
+        query["is_public"] = True
+    yield from collection.find(query, _list_projection(fields)).batch_size(STREAM_BATCH_SIZE)
+
+def get_cases_by_user_id(user_id, fields=None):
+    """Get all cases created by a specific user
+    
+    Args:
+        user_id (str): Owner of the cases
+        fields (list, optional): Fields to return; defaults to CASE_LIST_FIELDS
+    """
     try:
-        cases = list(collection.find({"user_id": user_id}))
-        # Convert ObjectId to string for all cases
-        for case in cases:
-            case['_id'] = str(case['_id'])
-        
-        print(f"✅ Found {len(cases)} cases for user: {user_id}")
+        cases = list(iter_cases_by_user_id(user_id, fields))
+        logger.debug("✅ Found %s cases for user: %s", len(cases), user_id)
         return cases
     except Exception as e:
-        print(f"❌ Error retrieving user cases: {str(e)}")
+        logger.error("❌ Error retrieving user cases: %s", e)
         raise e
 
-def get_cases_by_status(status):
-    """Get all cases with a specific status"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+def iter_cases_by_status(status, fields=None):
+    """Yield cases with a specific status, fetched STREAM_BATCH_SIZE at a time"""
+    collection = get_collection("cases", str_ids=True)
+    yield from collection.find({"status": status}, _list_projection(fields)).batch_size(STREAM_BATCH_SIZE)
+
+def get_cases_by_status(status, fields=None):
+    """Get all cases with a specific status
+    
+    Args:
+        status (str): Case status to match
+        fields (list, optional): Fields to return; defaults to CASE_LIST_FIELDS
+    """
     try:
-        cases = list(collection.find({"status": status}))
-        # Convert ObjectId to string for all cases
-        for case in cases:
-            case['_id'] = str(case['_id'])
-        
-        print(f"✅ Found {len(cases)} cases with status: {status}")
+        cases = list(iter_cases_by_status(status, fields))
+        logger.debug("✅ Found %s cases with status: %s", len(cases), status)
         return cases
     except Exception as e:
-        print(f"❌ Error retrieving cases by status: {str(e)}")
+        logger.error("❌ Error retrieving cases by status: %s", e)
         raise e
 
 def delete_case(case_id):
     """Delete a case (be careful with this!)"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    collection = get_collection("cases", str_ids=True)
     try:
         result = collection.delete_one({"case_id": case_id})
         success = result.deleted_count > 0
         if success:
-            print(f"✅ Case deleted: {case_id}")
+            _clear_list_caches()
+            logger.info("✅ Case deleted: %s", case_id)
         else:
-            print(f"⚠️ Case not found for deletion: {case_id}")
+            logger.warning("⚠️ Case not found for deletion: %s", case_id)
         return success
     except Exception as e:
-        print(f"❌ Error deleting case: {str(e)}")
+        logger.error("❌ Error deleting case: %s", e)
         raise e
 
-def get_all_cases(page=1, per_page=20, filters=None):
-    """Get cases with pagination and filters"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+@ttl_cache(ttl=10, maxsize=256)
+def get_all_cases(page=1, per_page=20, filters=None, cursor=None):
+    """Get cases with pagination and filters
+
+    Pass the previous response's `next_cursor` as `cursor` to fetch the next
+    page by range on (created_at, _id) instead of skipping rows; `page` is
+    then ignored. Without a cursor, `page` falls back to skip/limit.
+
+    Results are cached for a few seconds and cleared on any case write, so the
+    returned dict is shared and must not be mutated by callers.
+    """
+    collection = get_collection("cases", str_ids=True)
     
     try:
-        skip = (page - 1) * per_page
-        
         # Build filter query
         query = {}
         if filters:
@@ -178,20 +278,26 @@ def get_all_cases(page=1, per_page=20, filters=None):
                 query['is_public'] = filters['is_public']
         
         # Get total count
-        total = collection.count_documents(query)
+        total = _count_cases(collection, query)
         
-        # Get paginated results
-        cases = list(
-            collection
-            .find(query)
-            .sort("created_at", -1)
-            .skip(skip)
-            .limit(per_page)
-        )
+        # Get paginated results, newest first with _id as tiebreaker
+        page_query = query
+        if cursor:
+            after_created_at, after_id = decode_cursor(cursor)
+            after_id = ObjectId(after_id)
+            page_query = {**query, '$or': [
+                {'created_at': {'$lt': after_created_at}},
+                {'created_at': after_created_at, '_id': {'$lt': after_id}}
+            ]}
         
-        # Convert ObjectId to string
-        for case in cases:
-            case['_id'] = str(case['_id'])
+        find = collection.find(page_query).sort([("created_at", -1), ("_id", -1)])
+        if not cursor and page > 1:
+            find = find.skip((page - 1) * per_page)
+        cases = list(find.limit(per_page))
+        
+        next_cursor = None
+        if len(cases) == per_page and cases[-1].get('created_at'):
+            next_cursor = encode_cursor(cases[-1]['created_at'], cases[-1]['_id'])
         
         return {
             'cases': cases,
@@ -199,41 +305,66 @@ def get_all_cases(page=1, per_page=20, filters=None):
                 'page': page,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
+                'pages': (total + per_page - 1) // per_page,
+                'next_cursor': next_cursor
             }
         }
     except Exception as e:
-        print(f"❌ Error retrieving cases: {e}")
+        logger.error("❌ Error retrieving cases: %s", e)
         raise e
     
+def _add_evidence_files(case_id, addition):
+    """$addToSet evidence IDs and read back the case's list in the same round-trip"""
+    collection = get_collection("cases", str_ids=True)
+    case = collection.find_one_and_update(
+        {"case_id": case_id},
+        {"$addToSet": {"evidence_files": addition}},  # addToSet prevents duplicates
+        projection={"evidence_files": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if case is None:
+        logger.warning("⚠️ Case not found for evidence: %s", case_id)
+        return None
+    _clear_list_caches()
+    return case.get("evidence_files", [])
+
 def add_evidence_to_case(case_id, evidence_id):
-    """Add evidence ID to case's evidence list"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    """Add evidence ID to case's evidence list
+    
+    Returns:
+        list: The case's updated evidence_files, or None if the case does not exist
+    """
     try:
-        result = collection.update_one(
-            {"case_id": case_id},
-            {"$addToSet": {"evidence_files": evidence_id}}  # addToSet prevents duplicates
-        )
-        
-        success = result.modified_count > 0
-        if success:
-            print(f"✅ Evidence {evidence_id} added to case: {case_id}")
-        return success
+        evidence_files = _add_evidence_files(case_id, evidence_id)
+        if evidence_files is not None:
+            logger.info("✅ Evidence %s added to case: %s", evidence_id, case_id)
+        return evidence_files
     except Exception as e:
-        print(f"❌ Error adding evidence to case: {str(e)}")
+        logger.error("❌ Error adding evidence to case: %s", e)
+        raise e
+
+def add_evidences_to_case(case_id, evidence_ids):
+    """Add several evidence IDs to a case's evidence list in one update
+    
+    Returns:
+        list: The case's updated evidence_files, or None if the case does not exist
+    """
+    try:
+        evidence_files = _add_evidence_files(case_id, {"$each": list(evidence_ids)})
+        if evidence_files is not None:
+            logger.info("✅ %s evidence files added to case: %s", len(evidence_ids), case_id)
+        return evidence_files
+    except Exception as e:
+        logger.error("❌ Error adding evidence to case: %s", e)
         raise e
 
 def set_case_privacy(case_id, is_public=False):
     """Set case as public or private"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    collection = get_collection("cases", str_ids=True)
     try:
         update_data = {
             'is_public': is_public,
-            'updated_at': datetime.utcnow()
+            'updated_at': datetime.now(timezone.utc)
         }
         
         result = collection.update_one(
@@ -243,74 +374,53 @@ def set_case_privacy(case_id, is_public=False):
         
         success = result.modified_count > 0
         if success:
+            _clear_list_caches()
             status = "public" if is_public else "private"
-            print(f"✅ Case privacy updated to {status}: {case_id}")
+            logger.info("✅ Case privacy updated to %s: %s", status, case_id)
         return success
     except Exception as e:
-        print(f"❌ Error updating case privacy: {e}")
+        logger.error("❌ Error updating case privacy: %s", e)
+        raise e
+
+def get_featured_cases(limit=10):
+    """Get the most recently published public cases that have a simulation
+    
+    Filtering, sorting and projection all happen in MongoDB (served by the
+    is_public + published_at index), so only summary fields are transferred.
+    
+    Returns:
+        tuple: (cases, total featured cases, total public cases)
+    """
+    collection = get_collection("cases", secondary=True, str_ids=True)
+    try:
+        cases = list(
+            collection
+            .find(_FEATURED_CASES_FILTER, _FEATURED_CASE_PROJECTION)
+            .sort('published_at', -1)
+            .limit(limit)
+        )
+        total_featured = _count_cases(collection, _FEATURED_CASES_FILTER)
+        total_public = _count_cases(collection, _PUBLIC_CASES_FILTER)
+        logger.debug("✅ Retrieved %s featured cases", len(cases))
+        return cases, total_featured, total_public
+    except Exception as e:
+        logger.error("❌ Error retrieving featured cases: %s", e)
         raise e
 
 def get_public_cases(limit=10):
-    """Get all public cases"""
-    collection = get_case_collection()
-    if collection is None:
-        raise ConnectionError("Database connection not available")
+    """Get all public cases (read from a secondary when one is available)"""
+    collection = get_collection("cases", secondary=True, str_ids=True)
     try:
-        # ✅ FIX: Use aggregation to join user data for author name
         pipeline = [
-            {'$match': {'is_public': True}},
+            {'$match': _PUBLIC_CASES_FILTER},
             {'$sort': {'created_at': -1}},
             {'$limit': limit},
-            {
-                # Convert user_id string to ObjectId for lookup
-                '$addFields': {
-                    'userObjectId': {
-                        '$cond': {
-                           'if': { '$and': [{'$ne': ['$user_id', None]}, {'$ne': ['$user_id', ""]}]},
-                           'then': { '$toObjectId': '$user_id' },
-                           'else': None
-                        }
-                    }
-                }
-            },
-            {
-                '$lookup': {
-                    'from': 'users',
-                    'localField': 'userObjectId',
-                    'foreignField': '_id',
-                    'as': 'userDetails'
-                }
-            },
-            {
-                '$unwind': {
-                    'path': '$userDetails',
-                    'preserveNullAndEmptyArrays': True # Keep cases even if user is not found
-                }
-            },
-            {
-                '$addFields': {
-                    'user': {
-                        'name': '$userDetails.name',
-                        'avatarUrl': '$userDetails.avatar'
-                    }
-                }
-            },
-            {
-                '$project': {
-                    'userDetails': 0,
-                    'userObjectId': 0
-                }
-            }
+            *_AUTHOR_LOOKUP_STAGES,
         ]
         cases = list(collection.aggregate(pipeline))
         
-        # Convert ObjectId to string for all cases
-        for case in cases:
-            case['_id'] = str(case['_id'])
-        
-        print(f"✅ Retrieved {len(cases)} public cases with user info")
+        logger.debug("✅ Retrieved %s public cases with user info", len(cases))
         return cases
     except Exception as e:
-        print(f"❌ Error retrieving public cases: {e}")
+        logger.error("❌ Error retrieving public cases: %s", e)
         raise e
-
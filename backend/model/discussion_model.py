@@ -1,99 +1,131 @@
-from db.mongo import get_db
+import logging
+from db.mongo import get_collection, bulk_write_mixed
 from bson import ObjectId
-from datetime import datetime
+from pymongo import InsertOne, UpdateOne, ReturnDocument
+from datetime import datetime, timezone
+
+logger = logging.getLogger("jurix.models")
+
+# Fields returned by get_case_discussions unless the caller asks for others
+DISCUSSION_LIST_FIELDS = [
+    "_id", "case_id", "user_id", "username", "content",
+    "created_at", "likes", "replies_count", "parent_id",
+]
+_DISCUSSION_LIST_PROJECTION = {field: 1 for field in DISCUSSION_LIST_FIELDS}
+
+# Documents per getMore when streaming discussions
+STREAM_BATCH_SIZE = 200
 
 def get_discussions_collection():
-    """Get the discussions collection"""
-    db = get_db()
-    return db["discussions"]
+    """Get the discussions collection (ObjectIds decode to str)"""
+    return get_collection("discussions", str_ids=True)
 
 def add_discussion(case_id, user_id, username, content, parent_id=None):
     """Add a new discussion/comment to a case"""
+    if parent_id and not ObjectId.is_valid(parent_id):
+        raise ValueError(f"Invalid parent discussion ID: {parent_id}")
     try:
         discussion_data = {
+            '_id': ObjectId(),  # generated here so it is known without a read back
             'case_id': case_id,
             'user_id': user_id,
             'username': username,
             'content': content,
             'parent_id': parent_id,  # For replies
-            'created_at': datetime.utcnow(),
+            'created_at': datetime.now(timezone.utc),
             'likes': 0,
             'replies_count': 0
         }
         
-        collection = get_discussions_collection()
-        result = collection.insert_one(discussion_data)
-        
-        # If this is a reply, update parent's reply count
         if parent_id:
-            collection.update_one(
-                {"_id": ObjectId(parent_id)},
-                {"$inc": {"replies_count": 1}}
-            )
+            # Insert the reply and bump the parent's reply count together
+            bulk_write_mixed("discussions", lambda namespace: [
+                InsertOne(discussion_data, namespace=namespace),
+                UpdateOne(
+                    {"_id": ObjectId(parent_id)},
+                    {"$inc": {"replies_count": 1}},
+                    namespace=namespace
+                )
+            ])
+        else:
+            get_discussions_collection().insert_one(discussion_data)
         
-        print(f"✅ Discussion added: {result.inserted_id}")
-        return str(result.inserted_id)
+        logger.info("✅ Discussion added: %s", discussion_data['_id'])
+        return str(discussion_data['_id'])
     except Exception as e:
-        print(f"❌ Error adding discussion: {e}")
+        logger.error("❌ Error adding discussion: %s", e)
         raise e
 
-def get_case_discussions(case_id):
-    """Get all discussions for a case"""
+def iter_case_discussions(case_id, fields=None):
+    """Yield a case's discussions newest first, fetched STREAM_BATCH_SIZE at a time"""
+    collection = get_discussions_collection()
+    projection = {field: 1 for field in fields} if fields else _DISCUSSION_LIST_PROJECTION
+    cursor = collection.find({"case_id": case_id}, projection).sort("created_at", -1)
+    yield from cursor.batch_size(STREAM_BATCH_SIZE)
+
+def get_case_discussions(case_id, fields=None):
+    """Get all discussions for a case, returning only `fields` (default DISCUSSION_LIST_FIELDS)"""
     try:
-        collection = get_discussions_collection()
-        discussions = list(collection.find({"case_id": case_id}).sort("created_at", -1))
-        
-        # Convert ObjectId to string
-        for discussion in discussions:
-            discussion['_id'] = str(discussion['_id'])
+        discussions = list(iter_case_discussions(case_id, fields))
         
-        print(f"✅ Found {len(discussions)} discussions for case: {case_id}")
+        logger.debug("✅ Found %s discussions for case: %s", len(discussions), case_id)
         return discussions
     except Exception as e:
-        print(f"❌ Error getting discussions: {e}")
+        logger.error("❌ Error getting discussions: %s", e)
         return []
 
 def like_discussion(discussion_id):
-    """Like a discussion"""
+    """Like a discussion
+    
+    Returns:
+        int: The new like count, or None if the discussion was not updated
+    """
+    if not ObjectId.is_valid(discussion_id):
+        return None
     try:
         collection = get_discussions_collection()
-        result = collection.update_one(
+        discussion = collection.find_one_and_update(
             {"_id": ObjectId(discussion_id)},
-            {"$inc": {"likes": 1}}
+            {"$inc": {"likes": 1}},
+            projection={"likes": 1, "_id": 0},
+            return_document=ReturnDocument.AFTER
         )
         
-        success = result.modified_count > 0
-        if success:
-            print(f"✅ Discussion liked: {discussion_id}")
-        return success
+        if discussion is None:
+            return None
+        logger.info("✅ Discussion liked: %s", discussion_id)
+        return discussion.get("likes", 0)
     except Exception as e:
-        print(f"❌ Error liking discussion: {e}")
-        return False
+        logger.error("❌ Error liking discussion: %s", e)
+        return None
 
 def get_discussion_by_id(discussion_id):
     """Get a single discussion by ID"""
+    if not ObjectId.is_valid(discussion_id):
+        return None
     try:
         collection = get_discussions_collection()
         discussion = collection.find_one({"_id": ObjectId(discussion_id)})
         if discussion:
-            discussion['_id'] = str(discussion['_id'])
-            print(f"✅ Discussion found: {discussion_id}")
+            logger.debug("✅ Discussion found: %s", discussion_id)
             return discussion
         return None
     except Exception as e:
-        print(f"❌ Error getting discussion: {e}")
+        logger.error("❌ Error getting discussion: %s", e)
         return None
 
 def delete_discussion(discussion_id, user_id):
     """Delete a discussion (only by the user who created it)"""
+    if not ObjectId.is_valid(discussion_id):
+        return False
     try:
         collection = get_discussions_collection()
         result = collection.delete_one({"_id": ObjectId(discussion_id), "user_id": user_id})
 
         success = result.deleted_count > 0
         if success:
-            print(f"✅ Discussion deleted: {discussion_id}")
+            logger.info("✅ Discussion deleted: %s", discussion_id)
         return success
     except Exception as e:
-        print(f"❌ Error deleting discussion: {e}")
+        logger.error("❌ Error deleting discussion: %s", e)
         return False
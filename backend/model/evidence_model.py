@@ -1,37 +1,53 @@
-from db.mongo import evidence_collection
+import logging
+from db.mongo import get_collection
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timezone
+from pymongo import InsertOne
+
+logger = logging.getLogger("jurix.models")
 
 def create_evidence(evidence_data):
     """Creates a new evidence entry in the database"""
-    if evidence_collection is None:
-        raise ConnectionError("Database connection not available")
+    evidence_collection = get_collection("evidence", str_ids=True)
     try:
-        evidence_data['created_at'] = datetime.utcnow()
+        evidence_data['created_at'] = datetime.now(timezone.utc)
         result = evidence_collection.insert_one(evidence_data)
         return str(result.inserted_id)
     except Exception as e:
-        print(f"Error saving evidence: {str(e)}")
+        logger.error("Error saving evidence: %s", e)
+        raise e
+
+def create_evidences(evidence_list):
+    """Create several evidence entries with one unordered bulk write
+    
+    Returns:
+        list: The new evidence IDs, in the same order as evidence_list
+    """
+    evidence_collection = get_collection("evidence", str_ids=True)
+    if not evidence_list:
+        return []
+    try:
+        now = datetime.now(timezone.utc)
+        docs = [{**evidence_data, '_id': ObjectId(), 'created_at': now} for evidence_data in evidence_list]
+        evidence_collection.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+        return [str(doc['_id']) for doc in docs]
+    except Exception as e:
+        logger.error("Error saving evidences: %s", e)
         raise e
 
 def get_evidence_by_id(evidence_id):
     """Retrieve an evidence entry by its ID"""
-    if evidence_collection is None:
-        raise ConnectionError("Database connection not available")
+    evidence_collection = get_collection("evidence", str_ids=True)
     try:
         evidence = evidence_collection.find_one({"_id": ObjectId(evidence_id)})
-        if evidence:
-            # Convert ObjectId to string for JSON serialization
-            evidence['_id'] = str(evidence['_id'])
         return evidence
     except Exception as e:
-        print(f"Error retrieving evidence: {str(e)}")
+        logger.error("Error retrieving evidence: %s", e)
         raise e
 
 def update_evidence(evidence_id, update_data):
     """Update an evidence entry"""
-    if evidence_collection is None:
-        raise ConnectionError("Database connection not available")
+    evidence_collection = get_collection("evidence", str_ids=True)
     try:
         result = evidence_collection.update_one(
             {"_id": ObjectId(evidence_id)},
@@ -39,31 +55,37 @@ def update_evidence(evidence_id, update_data):
         )
         return result.modified_count > 0
     except Exception as e:
-        print(f"Error updating evidence: {str(e)}")
+        logger.error("Error updating evidence: %s", e)
         raise e
 
 def delete_evidence(evidence_id):
     """Delete an evidence entry"""
-    if evidence_collection is None:
-        raise ConnectionError("Database connection not available")
+    evidence_collection = get_collection("evidence", str_ids=True)
     try:
         result = evidence_collection.delete_one({"_id": ObjectId(evidence_id)})
         return result.deleted_count > 0
     except Exception as e:
-        print(f"Error deleting evidence: {str(e)}")
+        logger.error("Error deleting evidence: %s", e)
         raise e
 
-def list_evidences(filter_criteria=None):
-    """List all evidence entries, optionally filtered by criteria"""
-    if evidence_collection is None:
-        raise ConnectionError("Database connection not available")
+# Documents per getMore when streaming evidence
+STREAM_BATCH_SIZE = 200
+
+def iter_evidences(filter_criteria=None, fields=None):
+    """Yield evidence entries matching filter_criteria, fetched STREAM_BATCH_SIZE at a time"""
+    evidence_collection = get_collection("evidence", str_ids=True)
+    projection = {field: 1 for field in fields} if fields else None
+    yield from evidence_collection.find(filter_criteria or {}, projection).batch_size(STREAM_BATCH_SIZE)
+
+def list_evidences(filter_criteria=None, fields=None):
+    """List all evidence entries, optionally filtered by criteria
+    
+    Full documents are returned unless `fields` names the ones to keep;
+    simulation and chatbot context need the parsed content.
+    """
     try:
-        filter_criteria = filter_criteria or {}
-        evidences = list(evidence_collection.find(filter_criteria))
-        for evidence in evidences:
-            evidence['_id'] = str(evidence['_id'])  # Convert ObjectId to string
-        return evidences
+        return list(iter_evidences(filter_criteria, fields))
     except Exception as e:
-        print(f"Error listing evidences: {str(e)}")
+        logger.error("Error listing evidences: %s", e)
         raise e
 
@@ -1,85 +1,211 @@
-from db.mongo import user_collection
+import logging
+from db.mongo import get_collection, get_user_collection
 from werkzeug.security import generate_password_hash, check_password_hash
 from bson import ObjectId
-from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone
+from functools import lru_cache
+from utils.cache import ttl_memo
 import re
 
+# Argon2id is optional - without it passwords keep using werkzeug's hashes
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+    ARGON2_AVAILABLE = True
+except ImportError:
+    ARGON2_AVAILABLE = False
+
+logger = logging.getLogger("jurix.models")
+
+# Cached lookups never carry the hash; verify_password reads it uncached
+_WITHOUT_PASSWORD = {'password': 0}
+
+# OWASP-recommended Argon2id minimum: 19 MiB memory, 2 passes, 1 lane
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=19_456, parallelism=1) if ARGON2_AVAILABLE else None
+
+def hash_password(password: str) -> str:
+    """Hash a password with Argon2id when available, else werkzeug's default"""
+    if _password_hasher is not None:
+        return _password_hasher.hash(password)
+    return generate_password_hash(password)
+
+def _check_password(stored_hash: str, password: str):
+    """Check a password against an Argon2 or legacy werkzeug hash
+    
+    Returns:
+        tuple: (matches, needs_rehash)
+    """
+    if stored_hash.startswith('$argon2'):
+        if _password_hasher is None:
+            logger.error("❌ Argon2 hash found but argon2-cffi is not installed")
+            return False, False
+        try:
+            _password_hasher.verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False, False
+        return True, _password_hasher.check_needs_rehash(stored_hash)
+    
+    matches = check_password_hash(stored_hash, password)
+    return matches, matches and _password_hasher is not None
+
+@lru_cache(maxsize=10000)
+def _to_object_id(user_id: str):
+    """Parse a user ID string once; None if it is not a valid ObjectId"""
+    return ObjectId(user_id) if ObjectId.is_valid(user_id) else None
+
+@ttl_memo(ttl=300, maxsize=10000)
 def get_user_by_email(email: str):
-    """Retrieve user by email"""
-    if user_collection is None:
-        raise ConnectionError("Database connection not available")
-    return user_collection.find_one({'email': email})
+    """Retrieve user by email, without the password hash (cached; invalidated by update_user)"""
+    user_collection = get_collection("users")
+    return user_collection.find_one({'email': email}, _WITHOUT_PASSWORD)
 
+@ttl_memo(ttl=300, maxsize=10000)
 def get_user_by_id(user_id: str):
-    """Retrieve user by ID"""
-    if user_collection is None:
-        raise ConnectionError("Database connection not available")
+    """Retrieve user by ID, without the password hash (cached; invalidated by update_user)"""
+    user_collection = get_collection("users")
     try:
-        if ObjectId.is_valid(user_id):
-            return user_collection.find_one({'_id': ObjectId(user_id)})
+        oid = _to_object_id(user_id)
+        if oid is not None:
+            return user_collection.find_one({'_id': oid}, _WITHOUT_PASSWORD)
         return None
     except Exception as e:
-        print(f"Error getting user by ID: {e}")
+        logger.error("Error getting user by ID: %s", e)
         return None
 
+def get_user_role(user_id: str):
+    """Retrieve only a user's role (None if the user does not exist)"""
+    user_collection = get_collection("users")
+    oid = _to_object_id(user_id)
+    if oid is None:
+        return None
+    user = user_collection.find_one({'_id': oid}, {'role': 1, '_id': 0})
+    return user.get('role') if user else None
+
+def _forget_user(user_collection, user_id: str, new_email: str = None):
+    """Drop a user's cached documents, looking up their email if it is not cached"""
+    cached = get_user_by_id.cache_pop(user_id)
+    oid = _to_object_id(user_id)
+    if cached is None and oid is not None:
+        cached = user_collection.find_one({'_id': oid}, {'email': 1})
+    for email in {cached.get('email') if cached else None, new_email}:
+        if email:
+            get_user_by_email.cache_pop(email)
+
 def create_user(user_data: dict):
-    """Insert a new user with hashed password"""
-    if user_collection is None:
-        raise ConnectionError("Database connection not available")
+    """Insert a new user with hashed password
+    
+    Returns:
+        dict: The inserted document (insert_one adds its _id in place)
+    """
+    user_collection = get_collection("users")
     
     # Hash the password before storing
     if 'password' in user_data and user_data['password']:
-        user_data['password'] = generate_password_hash(user_data['password'])
+        user_data['password'] = hash_password(user_data['password'])
     
     # Add timestamps
-    user_data['created_at'] = datetime.utcnow()
-    user_data['updated_at'] = datetime.utcnow()
+    now = datetime.now(timezone.utc)
+    user_data['created_at'] = now
+    user_data['updated_at'] = now
     
     try:
         result = user_collection.insert_one(user_data)
-        print(f"✅ User created with ID: {result.inserted_id}")
-        return result.inserted_id
+        logger.info("✅ User created with ID: %s", result.inserted_id)
+        return user_data
+    except DuplicateKeyError:
+        logger.warning("⚠️ Email already registered: %s", user_data.get('email'))
+        raise
     except Exception as e:
-        print(f"❌ Error creating user: {e}")
+        logger.error("❌ Error creating user: %s", e)
         raise e
 
 def update_user(user_id: str, update_data: dict):
     """Update an existing user by ID"""
-    if user_collection is None:
-        raise ConnectionError("Database connection not available")
+    user_collection = get_collection("users")
     
     # Add updated timestamp
-    update_data['updated_at'] = datetime.utcnow()
+    update_data['updated_at'] = datetime.now(timezone.utc)
     
     try:
-        if ObjectId.is_valid(user_id):
+        oid = _to_object_id(user_id)
+        if oid is not None:
             result = user_collection.update_one(
-                {'_id': ObjectId(user_id)}, 
+                {'_id': oid}, 
                 {'$set': update_data}
             )
+            _forget_user(user_collection, user_id, update_data.get('email'))
             return result.modified_count
         return 0
     except Exception as e:
-        print(f"❌ Error updating user: {e}")
+        logger.error("❌ Error updating user: %s", e)
         return 0
 
+def atomic_update_and_fetch(user_id: str, updates: dict):
+    """Update a user by ID and return the updated document in one round-trip
+    
+    Returns:
+        dict: The user after the update, or None if the user does not exist
+    """
+    user_collection = get_collection("users")
+    oid = _to_object_id(user_id)
+    if oid is None:
+        return None
+    
+    # Copy rather than stamp the caller's dict (google_login reuses its updates)
+    updates = {**updates, 'updated_at': datetime.now(timezone.utc)}
+    
+    if 'email' in updates:
+        # The old address can only be looked up before it is overwritten
+        _forget_user(user_collection, user_id)
+    
+    try:
+        user = user_collection.find_one_and_update(
+            {'_id': oid},
+            {'$set': updates},
+            projection=_WITHOUT_PASSWORD,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        logger.error("❌ Error updating user: %s", e)
+        return None
+    
+    # The returned document already carries the (new) email, so no lookup is needed
+    get_user_by_id.cache_pop(user_id)
+    if user:
+        get_user_by_email.cache_pop(user.get('email'))
+    return user
+
 def verify_password(email: str, password: str):
     """Verify user password"""
     try:
-        user = get_user_by_email(email)
-        if user and user.get('password') and check_password_hash(user['password'], password):
-            return user
-        return None
+        # Always read the hash from the database: a cached copy could keep an
+        # old password working on other workers after a change or reset
+        user = get_collection("users").find_one({'email': email})
+        if not user or not user.get('password'):
+            return None
+        
+        stored_hash = user.pop('password')
+        matches, needs_rehash = _check_password(stored_hash, password)
+        if not matches:
+            return None
+        if needs_rehash:
+            # Migrate legacy/outdated hashes on successful login
+            update_user(str(user['_id']), {'password': hash_password(password)})
+        return user
     except Exception as e:
-        print(f"❌ Error verifying password: {e}")
+        logger.error("❌ Error verifying password: %s", e)
         return None
 
 def email_exists(email: str):
     """Check if email already exists"""
+    user_collection = get_user_collection()
     if user_collection is None:
         return False
     try:
-        return user_collection.find_one({'email': email}) is not None
+        # Answered from the unique email index without fetching the document
+        return user_collection.count_documents({'email': email}, limit=1) > 0
     except Exception as e:
-        print(f"❌ Error checking email existence: {e}")
+        logger.error("❌ Error checking email existence: %s", e)
         return False
\ No newline at end of file
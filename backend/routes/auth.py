@@ -18,16 +18,24 @@ Dependencies:
 Author: Jurix Development Team
 """
 
-from flask import Blueprint, request, jsonify
-import re
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 import jwt
-import datetime
+from datetime import datetime, timezone
 import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from model.user import (
     create_user, get_user_by_email, get_user_by_id,
-    update_user, verify_password, email_exists
+    update_user, atomic_update_and_fetch, verify_password
 )
+from model.case_model import iter_cases_by_user_id
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from utils.password_validator import PasswordValidator
+from utils.validators import EMAIL_PATTERN, normalize_email
+from utils.jwt_utils import JWT_SECRET, generate_token, verify_token
+
+logger = logging.getLogger("jurix.auth")
 
 # Google OAuth imports
 try:
@@ -35,111 +43,116 @@ try:
     from google.oauth2 import id_token
     import google.auth.exceptions
     GOOGLE_AUTH_AVAILABLE = True
-    print("✅ Google Auth libraries loaded successfully")
+    logger.info("✅ Google Auth libraries loaded successfully")
 except ImportError:
-    print("⚠️ Google Auth libraries not installed. Run: pip install google-auth google-auth-oauthlib")
+    logger.warning("⚠️ Google Auth libraries not installed. Run: pip install google-auth google-auth-oauthlib")
     GOOGLE_AUTH_AVAILABLE = False
 
 # Blueprint
 user_bp = Blueprint('users', __name__)
 
 # Config
-JWT_SECRET = os.getenv('JWT_SECRET') or 'your-secret-key-for-development-only'
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 
+# One transport (and requests.Session) for all logins, so fetching Google's
+# signing certs reuses kept-alive HTTPS connections
+GOOGLE_REQUEST = google_requests.Request() if GOOGLE_AUTH_AVAILABLE else None
+
+# Runs the user lookup for a Google login while its token is being verified
+_lookup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="google-login")
+
 # ---------------- Helper Functions ----------------
 
 def validate_email(email):
     """Simple email validation"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 def serialize_user(user):
     """Convert MongoDB user doc to JSON-serializable format"""
     if user:
-        user_copy = user.copy()
-        user_copy['_id'] = str(user_copy['_id'])
-        user_copy.pop('password', None)
-        return user_copy
+        return {k: (str(v) if k == '_id' else v) for k, v in user.items() if k != 'password'}
     return None
 
-def generate_token(user_id, email):
-    """Generate JWT token"""
-    payload = {
-        'user_id': str(user_id),
-        'email': email,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
-    }
-    return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
-
-def verify_token(token):
-    """Verify JWT token"""
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
-        print(f"❌ Token verification failed: {e}")
-        return None
-
 # ---------------- Routes ----------------
 
 # ----------- Google OAuth Login/Signup -----------
 @user_bp.route('/auth/google', methods=['POST', 'OPTIONS'])
 def google_login():
-    if request.method == 'OPTIONS':
-        return '', 200
-
-    print(f"🔍 Google login attempt - GOOGLE_AUTH_AVAILABLE: {GOOGLE_AUTH_AVAILABLE}")
-    print(f"🔍 GOOGLE_CLIENT_ID configured: {'Yes' if GOOGLE_CLIENT_ID else 'No'}")
+    logger.debug("🔍 Google login attempt - GOOGLE_AUTH_AVAILABLE: %s", GOOGLE_AUTH_AVAILABLE)
+    logger.debug("🔍 GOOGLE_CLIENT_ID configured: %s", 'Yes' if GOOGLE_CLIENT_ID else 'No')
 
     if not GOOGLE_AUTH_AVAILABLE:
-        print("❌ Google auth libraries not available")
+        logger.error("❌ Google auth libraries not available")
         return jsonify({'error': 'Google authentication not available. Please install required packages.'}), 503
     
     if not GOOGLE_CLIENT_ID:
-        print("❌ Google Client ID not configured")
+        logger.error("❌ Google Client ID not configured")
         return jsonify({'error': 'Google OAuth not configured. Please set GOOGLE_CLIENT_ID environment variable.'}), 500
 
     data = request.get_json()
-    print(f"🔍 Received data: {data is not None}")
+    logger.debug("🔍 Received data: %s", data is not None)
     
     if not data or 'credential' not in data:
-        print("❌ No credential in request")
+        logger.warning("❌ No credential in request")
         return jsonify({'error': 'Google credential is required'}), 400
 
     credential = data['credential']
-    print(f"🔍 Credential length: {len(credential) if credential else 0}")
+    logger.debug("🔍 Credential length: %d", len(credential) if credential else 0)
+
+    # Start the user lookup from the token's unverified email so the DB round
+    # trip overlaps Google's signature check; the result is only used if the
+    # verified email turns out to be the same
+    try:
+        claimed_email = jwt.decode(credential, options={'verify_signature': False}).get('email')
+    except (jwt.PyJWTError, TypeError):
+        claimed_email = None
+    if isinstance(claimed_email, str):
+        claimed_email = normalize_email(claimed_email)
+        lookup = _lookup_executor.submit(get_user_by_email, claimed_email)
+    else:
+        lookup = None
 
     # Verify token with enhanced error handling
     try:
-        print("🔍 Verifying Google token...")
+        logger.debug("🔍 Verifying Google token...")
         idinfo = id_token.verify_oauth2_token(
             credential,
-            google_requests.Request(),
+            GOOGLE_REQUEST,
             GOOGLE_CLIENT_ID
         )
-        print(f"✅ Token verified successfully for email: {idinfo.get('email')}")
+        logger.debug("✅ Token verified successfully for email: %s", idinfo.get('email'))
     except ValueError as e:
-        print(f"❌ Google token verification failed: {str(e)}")
+        logger.warning("❌ Google token verification failed: %s", e)
         return jsonify({'error': f'Invalid Google token: {str(e)}'}), 401
     except Exception as e:
-        print(f"❌ Unexpected error during token verification: {str(e)}")
+        logger.error("❌ Unexpected error during token verification: %s", e)
         return jsonify({'error': f'Token verification error: {str(e)}'}), 500
 
     email = idinfo.get('email')
     if not email or not idinfo.get('email_verified', False):
         return jsonify({'error': 'Google email not verified'}), 400
+    email = normalize_email(email)
 
-    existing_user = get_user_by_email(email.lower())
+    now = datetime.now(timezone.utc)
+    if lookup is not None and claimed_email == email:
+        existing_user = lookup.result()
+    else:
+        existing_user = get_user_by_email(email)
 
     if existing_user:
-        # Update Google info and last login
-        update_user(str(existing_user['_id']), {
+        # Update last login, plus any Google info that actually changed
+        updates = {'last_login': now}
+        google_info = {
             'google_id': idinfo.get('sub'),
-            'avatar': idinfo.get('picture', existing_user.get('avatar', '')),
-            'last_login': datetime.datetime.utcnow()
-        })
-        updated_user = get_user_by_id(str(existing_user['_id']))
-        token = generate_token(existing_user['_id'], existing_user['email'])
+            'avatar': idinfo.get('picture', existing_user.get('avatar', ''))
+        }
+        for field, value in google_info.items():
+            if existing_user.get(field) != value:
+                updates[field] = value
+        updated_user = atomic_update_and_fetch(str(existing_user['_id']), updates)
+        if not updated_user:
+            return jsonify({'error': 'Failed to update user'}), 500
+        token = generate_token(updated_user['_id'], updated_user['email'], updated_user.get('role'), now)
         return jsonify({
             'message': 'Google login successful',
             'token': token,
@@ -152,18 +165,17 @@ def google_login():
         'name': idinfo.get('name', ''),
         'firstName': idinfo.get('given_name', ''),
         'lastName': idinfo.get('family_name', ''),
-        'email': email.lower(),
+        'email': email,
         'password': '',
         'role': 'lawyer',
         'avatar': idinfo.get('picture', ''),
         'auth_provider': 'google',
         'google_id': idinfo.get('sub'),
         'email_verified': True,
-        'last_login': datetime.datetime.utcnow()
+        'last_login': now
     }
-    user_id = create_user(user_data)
-    new_user = get_user_by_id(str(user_id))
-    token = generate_token(new_user['_id'], new_user['email'])
+    new_user = create_user(user_data)
+    token = generate_token(new_user['_id'], new_user['email'], new_user.get('role'), now)
     return jsonify({
         'message': 'Account created and login successful',
         'token': token,
@@ -174,8 +186,6 @@ def google_login():
 # ----------- Signup -----------
 @user_bp.route('/auth/signup', methods=['POST', 'OPTIONS'])
 def signup():
-    if request.method == 'OPTIONS':
-        return '', 200
     data = request.get_json()
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -185,14 +195,11 @@ def signup():
         if not data.get(field) or not data.get(field).strip():
             return jsonify({'error': f'{field} is required'}), 400
 
-    email = data['email'].lower().strip()
+    email = normalize_email(data['email'])
     if not validate_email(email):
         return jsonify({'error': 'Invalid email format'}), 400
-    if email_exists(email):
-        return jsonify({'error': 'Email already registered'}), 409
 
     password = data['password']
-    from utils.password_validator import PasswordValidator
     is_valid, errors = PasswordValidator.validate_password(password)
     if not is_valid:
         return jsonify({'error': 'Password validation failed', 'details': errors}), 400
@@ -210,8 +217,12 @@ def signup():
         'auth_provider': 'local',
         'email_verified': False
     }
-    user_id = create_user(user_data)
-    new_user = get_user_by_id(str(user_id))
+    # The unique email index rejects duplicates atomically, so there is no
+    # separate (racy) existence check before the insert
+    try:
+        new_user = create_user(user_data)
+    except DuplicateKeyError:
+        return jsonify({'error': 'Email already registered'}), 409
     return jsonify({
         'message': 'User created successfully',
         'user': serialize_user(new_user)
@@ -220,13 +231,11 @@ def signup():
 # ----------- Login -----------
 @user_bp.route('/auth/login', methods=['POST', 'OPTIONS'])
 def login():
-    if request.method == 'OPTIONS':
-        return '', 200
     data = request.get_json()
     if not data:
         return jsonify({'error': 'No data provided'}), 400
 
-    email = data.get('email', '').lower().strip()
+    email = normalize_email(data.get('email', ''))
     password = data.get('password', '')
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
@@ -235,8 +244,9 @@ def login():
     if not user:
         return jsonify({'error': 'Invalid email or password'}), 401
 
-    update_user(str(user['_id']), {'last_login': datetime.datetime.utcnow()})
-    token = generate_token(user['_id'], user['email'])
+    now = datetime.now(timezone.utc)
+    update_user(str(user['_id']), {'last_login': now})
+    token = generate_token(user['_id'], user['email'], user.get('role'), now)
     return jsonify({
         'message': 'Login successful',
         'token': token,
@@ -246,14 +256,11 @@ def login():
 # ----------- Token Verification -----------
 @user_bp.route('/auth/verify', methods=['GET', 'OPTIONS'])
 def verify_token_endpoint():
-    if request.method == 'OPTIONS':
-        return '', 200
-
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
         return jsonify({'error': 'No token provided'}), 401
 
-    token = auth_header.split(' ')[1]
+    token = auth_header[7:]
     payload = verify_token(token)
     if not payload:
         return jsonify({'error': 'Invalid or expired token'}), 401
@@ -267,40 +274,32 @@ def verify_token_endpoint():
 # ----------- Logout -----------
 @user_bp.route('/auth/logout', methods=['POST', 'OPTIONS'])
 def logout():
-    if request.method == 'OPTIONS':
-        return '', 200
-
     auth_header = request.headers.get('Authorization')
     if auth_header and auth_header.startswith('Bearer '):
-        token = auth_header.split(' ')[1]
+        token = auth_header[7:]
         payload = verify_token(token)
         if payload:
             user = get_user_by_id(payload['user_id'])
             if user:
-                update_user(str(user['_id']), {'last_logout': datetime.datetime.utcnow()})
+                update_user(str(user['_id']), {'last_logout': datetime.now(timezone.utc)})
 
     return jsonify({'message': 'Logout successful'}), 200
 
 # ----------- Health Check -----------
 @user_bp.route('/auth/health', methods=['GET', 'OPTIONS'])
 def health_check():
-    if request.method == 'OPTIONS':
-        return '', 200
     google_status = "✅ Available" if (GOOGLE_AUTH_AVAILABLE and GOOGLE_CLIENT_ID) else "⚠️ Not configured"
     jwt_status = "✅ Configured" if JWT_SECRET != 'your-secret-key-for-development-only' else "⚠️ Using default"
     return jsonify({
         'status': 'Auth service is running',
         'google_oauth': google_status,
         'jwt_secret': jwt_status,
-        'timestamp': datetime.datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }), 200
 
 # ----------- User Profile -----------
 @user_bp.route('/auth/<user_id>', methods=['GET', 'PUT', 'OPTIONS'])
 def user_profile(user_id):
-    if request.method == 'OPTIONS':
-        return '', 200
-
     if request.method == 'GET':
         user = get_user_by_id(user_id)
         if not user:
@@ -313,36 +312,50 @@ def user_profile(user_id):
             data.pop(field, None)
 
         if 'email' in data:
+            data['email'] = normalize_email(data['email'])
             if not validate_email(data['email']):
                 return jsonify({'error': 'Invalid email format'}), 400
-            existing_user = get_user_by_email(data['email'].lower())
+            existing_user = get_user_by_email(data['email'])
             if existing_user and str(existing_user['_id']) != user_id:
                 return jsonify({'error': 'Email already taken'}), 409
-            data['email'] = data['email'].lower()
 
-        modified_count = update_user(user_id, data)
-        if modified_count == 0:
+        updated_user = atomic_update_and_fetch(user_id, data)
+        if not updated_user:
             return jsonify({'error': 'User not found or no changes made'}), 404
 
-        updated_user = get_user_by_id(user_id)
         return jsonify(serialize_user(updated_user)), 200
 
-# ----------- User Published Cases (Mock) -----------
+# ----------- User Published Cases -----------
 @user_bp.route('/auth/<user_id>/published-cases', methods=['GET', 'OPTIONS'])
 def get_user_published_cases(user_id):
-    if request.method == 'OPTIONS':
-        return '', 200
     user = get_user_by_id(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    mock_cases = [
-        {"id": 1, "title": "State vs Sharma", "type": "Criminal",
-         "description": "Case regarding theft under IPC Section 378.",
-         "createdAt": "2024-08-15", "isPublic": True,
-         "likes": 12, "comments": 3, "userId": user_id},
-        {"id": 2, "title": "Kumar vs Union of India", "type": "Constitutional",
-         "description": "Challenge to a law under Article 14 of the Constitution.",
-         "createdAt": "2024-09-01", "isPublic": False,
-         "likes": 5, "comments": 1, "userId": user_id}
-    ]
-    return jsonify(mock_cases), 200
+
+    # Stream the JSON array case by case so memory stays flat however many
+    # cases a user has published
+    dumps = current_app.json.dumps
+
+    # Run the query and fetch the first batch before any bytes are sent, so a
+    # database error here still turns into a 500 instead of a truncated 200
+    try:
+        cases = iter_cases_by_user_id(user_id, public_only=True)
+        first = next(cases, None)
+    except Exception as e:
+        logger.error("❌ Error retrieving published cases for %s: %s", user_id, e)
+        return jsonify({'error': 'Failed to retrieve published cases'}), 500
+
+    def generate():
+        yield '['
+        if first is not None:
+            yield dumps(first)
+            try:
+                for case in cases:
+                    yield ',' + dumps(case)
+            except Exception as e:
+                # Headers are already sent; record why the body is cut short
+                logger.error("❌ Published cases stream for %s failed mid-response: %s", user_id, e)
+                return
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json'), 200
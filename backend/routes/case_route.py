@@ -25,23 +25,41 @@ Dependencies:
 
 from flask import Blueprint, request, jsonify, send_file
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from model.case_model import (
     create_case,
     get_case_by_id,
     update_case,
     get_cases_by_user_id,
     set_case_privacy,
-    get_public_cases
+    get_public_cases,
+    get_featured_cases,
+    FEATURED_DESCRIPTION_LENGTH
 )
-from model.evidence_model import create_evidence, list_evidences
-from services.parsing.document_parsing_services import master_parser
+from model.evidence_model import create_evidence, get_evidence_by_id, list_evidences
+from services.parsing.evidence_tasks import submit_evidence_parse
+from bson import ObjectId
 import os
-from services.document_Service.report_generator import generate_case_pdf
-from io import BytesIO
+import logging
+from config import Config
+from services.document_Service.report_generator import get_cached_case_pdf
 
 case_bp = Blueprint('cases', __name__)
 
+logger = logging.getLogger("jurix.cases")
+
+# Evidence uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Case fields used by the PDF report (updated_at keys its cache)
+REPORT_CASE_FIELDS = [
+    'case_id', 'title', 'case_type', 'status', 'created_at', 'updated_at',
+    'description', 'parties', 'verdict', 'simulation_results.simulation_text',
+]
+
+# Evidence fields used by the PDF report's summary and timeline
+REPORT_EVIDENCE_FIELDS = ['_id', 'title', 'evidence_type', 'word_count', 'uploaded_at']
+
 @case_bp.route('/cases/create', methods=['POST', 'OPTIONS'])
 def create_new_case():
     """Create a new legal case"""
@@ -50,7 +68,7 @@ def create_new_case():
 
     try:
         data = request.get_json()
-        print(f"📋 Case creation request: {data}")  # Debug log
+        logger.debug("📋 Case creation request: %s", data)
 
         if not data:
             return jsonify({'error': 'No data provided'}), 400
@@ -63,6 +81,7 @@ def create_new_case():
 
         # Create unique case ID
         case_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
 
         # Prepare case data
         case_data = {
@@ -72,8 +91,8 @@ def create_new_case():
             'case_type': data['case_type'],
             'user_id': data['user_id'],
             'status': 'draft',
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow(),
+            'created_at': now,
+            'updated_at': now,
             'has_evidence': data.get('has_evidence', False),  # Flag for evidence requirement
             'parties': {
                 'plaintiff': data.get('plaintiff', ''),
@@ -96,7 +115,7 @@ def create_new_case():
         }), 201
 
     except Exception as e:
-        print(f"❌ Error creating case: {e}")
+        logger.error("❌ Error creating case: %s", e)
         return jsonify({'error': f'Failed to create case: {str(e)}'}), 500
 
 @case_bp.route('/cases/user/<user_id>', methods=['GET', 'OPTIONS'])
@@ -114,7 +133,7 @@ def get_user_cases(user_id):
         }), 200
 
     except Exception as e:
-        print(f"❌ Error getting user cases: {e}")
+        logger.error("❌ Error getting user cases: %s", e)
         return jsonify({'error': 'Failed to get user cases'}), 500
 
 @case_bp.route('/cases/<case_id>', methods=['GET', 'OPTIONS'])
@@ -140,7 +159,7 @@ def get_case_details(case_id):
         }), 200
 
     except Exception as e:
-        print(f"Error getting case: {e}")
+        logger.error("❌ Error getting case: %s", e)
         return jsonify({'error': 'Failed to get case'}), 500
 
 @case_bp.route('/cases/<case_id>/upload-evidence', methods=['POST', 'OPTIONS'])
@@ -174,27 +193,24 @@ def upload_evidence_to_case(case_id):
 
         # Create unique filename
         file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{case_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{file_extension}"
+        now = datetime.now(timezone.utc)
+        unique_filename = f"{case_id}_{now.strftime('%Y%m%d_%H%M%S')}{file_extension}"
         file_path = os.path.join(upload_folder, unique_filename)
 
-        # Save the file
-        file.save(file_path)
-
-        # Parse the document to extract text content
-        print(f"🔍 Parsing uploaded evidence: {unique_filename}")
-        parsed_result = master_parser(file_path, use_cache=False)
-
-        # Extract text content from parsing result
-        if isinstance(parsed_result, dict):
-            extracted_text = parsed_result.get('text', parsed_result.get('content', ''))
-            word_count = parsed_result.get('word_count', 0)
-            extraction_method = parsed_result.get('extraction_method', 'unknown')
-        else:
-            extracted_text = str(parsed_result)
-            word_count = len(extracted_text.split()) if extracted_text else 0
-            extraction_method = 'fallback'
-
-        # Create evidence record in database with parsed content
+        # Stream the upload to disk, counting bytes as they are written so
+        # oversized files are rejected early and no stat is needed afterwards
+        file_size = 0
+        with open(file_path, 'wb') as out:
+            while chunk := file.stream.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > Config.MAX_CONTENT_LENGTH:
+                    break
+                out.write(chunk)
+        if file_size > Config.MAX_CONTENT_LENGTH:
+            os.remove(file_path)
+            return jsonify({'error': f'File too large. Max size: {Config.MAX_CONTENT_LENGTH / (1024*1024)}MB'}), 413
+
+        # Record the evidence now; its content is parsed in the background
         evidence_data = {
             'case_id': case_id,
             'title': evidence_title,
@@ -203,33 +219,56 @@ def upload_evidence_to_case(case_id):
             'file_name': unique_filename,
             'file_path': file_path,
             'original_name': file.filename,
-            'file_size': os.path.getsize(file_path),
-            'uploaded_at': datetime.utcnow(),
-            'parsed_content': extracted_text,
-            'word_count': word_count,
-            'extraction_method': extraction_method,
-            'parsing_completed': True
+            'file_size': file_size,
+            'uploaded_at': now,
+            'parsed_content': '',
+            'word_count': 0,
+            'parsing_completed': False
         }
 
         # Save evidence to database
         evidence_id = create_evidence(evidence_data)
 
-        print(f"✅ Evidence uploaded and parsed: {word_count} words extracted using {extraction_method}")
+        # Parsing can take minutes for large PDFs; the result is written to the
+        # evidence record and pushed to the case room as 'evidence_parsed'
+        logger.info("🔍 Queued uploaded evidence for parsing: %s", unique_filename)
+        submit_evidence_parse(evidence_id, case_id, file_path)
 
         return jsonify({
-            'message': 'Evidence uploaded and processed successfully',
+            'message': 'Evidence uploaded; parsing in progress',
             'evidence_id': evidence_id,
             'file_name': unique_filename,
-            'parsed_content': extracted_text,
-            'word_count': word_count,
-            'extraction_method': extraction_method,
-            'ready_for_simulation': True
-        }), 201
+            'parsing_completed': False,
+            'status_url': f"/api/cases/{case_id}/evidence/{evidence_id}/status"
+        }), 202
 
     except Exception as e:
-        print(f"Error uploading evidence: {e}")
+        logger.error("❌ Error uploading evidence: %s", e)
         return jsonify({'error': 'Failed to upload evidence'}), 500
 
+@case_bp.route('/cases/<case_id>/evidence/<evidence_id>/status', methods=['GET', 'OPTIONS'])
+def get_evidence_parse_status(case_id, evidence_id):
+    """Report whether an uploaded evidence file has finished parsing"""
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        evidence = get_evidence_by_id(evidence_id) if ObjectId.is_valid(evidence_id) else None
+        if not evidence or evidence.get('case_id') != case_id:
+            return jsonify({'error': 'Evidence not found'}), 404
+
+        return jsonify({
+            'evidence_id': evidence_id,
+            'parsing_completed': evidence.get('parsing_completed', False),
+            'word_count': evidence.get('word_count', 0),
+            'extraction_method': evidence.get('extraction_method'),
+            'error': evidence.get('parsing_error')
+        }), 200
+
+    except Exception as e:
+        logger.error("❌ Error getting evidence status: %s", e)
+        return jsonify({'error': 'Failed to get evidence status'}), 500
+
 @case_bp.route('/cases/<case_id>/update-status', methods=['PUT', 'OPTIONS'])
 def update_case_status(case_id):
     """Update case status (draft -> ready_for_simulation -> completed)"""
@@ -245,10 +284,9 @@ def update_case_status(case_id):
         if new_status not in valid_statuses:
             return jsonify({'error': f'Invalid status. Must be one of: {valid_statuses}'}), 400
 
-        # Update case status
+        # Update case status (update_case stamps updated_at)
         update_data = {
-            'status': new_status,
-            'updated_at': datetime.utcnow()
+            'status': new_status
         }
 
         success = update_case(case_id, update_data)
@@ -262,7 +300,7 @@ def update_case_status(case_id):
         }), 200
 
     except Exception as e:
-        print(f"Error updating case status: {e}")
+        logger.error("❌ Error updating case status: %s", e)
         return jsonify({'error': 'Failed to update case status'}), 500
 
 @case_bp.route('/cases/<case_id>/privacy', methods=['PUT', 'OPTIONS'])
@@ -291,7 +329,7 @@ def update_case_privacy(case_id):
         }), 200
 
     except Exception as e:
-        print(f"Error updating privacy: {e}")
+        logger.error("❌ Error updating privacy: %s", e)
         return jsonify({'error': 'Failed to update privacy'}), 500
 
 @case_bp.route('/cases/public', methods=['GET', 'OPTIONS'])
@@ -313,7 +351,7 @@ def get_all_public_cases():
         }), 200
 
     except Exception as e:
-        print(f"Error getting public cases: {e}")
+        logger.error("❌ Error getting public cases: %s", e)
         return jsonify({'error': 'Failed to get public cases'}), 500
 
 @case_bp.route('/cases/<case_id>/publish', methods=['POST', 'OPTIONS'])
@@ -349,7 +387,7 @@ def publish_case(case_id):
 
         # Add publication metadata
         publication_data = {
-            'published_at': datetime.utcnow(),
+            'published_at': datetime.now(timezone.utc),
             'published_by': user_id,
             'publication_status': 'published',
             'has_simulation': has_simulation
@@ -366,7 +404,7 @@ def publish_case(case_id):
         }), 200
 
     except Exception as e:
-        print(f"Error publishing case: {e}")
+        logger.error("❌ Error publishing case: %s", e)
         return jsonify({'error': 'Failed to publish case'}), 500
 
 @case_bp.route('/cases/<case_id>/unpublish', methods=['POST', 'OPTIONS'])
@@ -399,7 +437,7 @@ def unpublish_case(case_id):
 
         # Update publication metadata
         unpublication_data = {
-            'unpublished_at': datetime.utcnow(),
+            'unpublished_at': datetime.now(timezone.utc),
             'publication_status': 'private'
         }
 
@@ -413,7 +451,7 @@ def unpublish_case(case_id):
         }), 200
 
     except Exception as e:
-        print(f"Error unpublishing case: {e}")
+        logger.error("❌ Error unpublishing case: %s", e)
         return jsonify({'error': 'Failed to unpublish case'}), 500
 
 @case_bp.route('/cases/public/<case_id>/simulate', methods=['POST', 'OPTIONS'])
@@ -477,7 +515,7 @@ def simulate_public_case(case_id):
             }), 200
 
     except Exception as e:
-        print(f"Error simulating public case: {e}")
+        logger.error("❌ Error simulating public case: %s", e)
         return jsonify({'error': 'Failed to access public case simulation'}), 500
 
 @case_bp.route('/cases/public/featured', methods=['GET', 'OPTIONS'])
@@ -487,43 +525,37 @@ def get_featured_public_cases():
         return '', 200
 
     try:
-        from model.case_model import get_public_cases
-
-        # Get public cases
-        all_public_cases = get_public_cases(limit=20)
+        # Filtered, sorted and projected in MongoDB
+        featured, total_featured, total_public = get_featured_cases(limit=10)
 
-        # Filter for cases with simulations (featured)
         featured_cases = []
-        for case in all_public_cases:
-            if case.get('simulation_results'):
-                case_summary = {
-                    'case_id': case['case_id'],
-                    'title': case['title'],
-                    'case_type': case['case_type'],
-                    'description': case.get('description', '')[:200] + '...' if len(case.get('description', '')) > 200 else case.get('description', ''),
-                    'parties': case.get('parties', {}),
-                    'published_at': case.get('published_at'),
-                    'has_simulation': True,
-                    'simulation_info': {
-                        'evidence_analyzed': case['simulation_results'].get('evidence_analyzed', 0),
-                        'simulation_type': case['simulation_results'].get('simulation_type', 'unknown'),
-                        'generated_at': case['simulation_results'].get('generated_at')
-                    }
+        for case in featured:
+            description = case.get('description', '')
+            simulation_results = case.get('simulation_results', {})
+            featured_cases.append({
+                'case_id': case['case_id'],
+                'title': case['title'],
+                'case_type': case['case_type'],
+                'description': description[:FEATURED_DESCRIPTION_LENGTH] + '...' if len(description) > FEATURED_DESCRIPTION_LENGTH else description,
+                'parties': case.get('parties', {}),
+                'published_at': case.get('published_at'),
+                'has_simulation': True,
+                'simulation_info': {
+                    'evidence_analyzed': simulation_results.get('evidence_analyzed', 0),
+                    'simulation_type': simulation_results.get('simulation_type', 'unknown'),
+                    'generated_at': simulation_results.get('generated_at')
                 }
-                featured_cases.append(case_summary)
-
-        # Sort by publication date (newest first)
-        featured_cases.sort(key=lambda x: x.get('published_at', datetime.min), reverse=True)
+            })
 
         return jsonify({
             'message': 'Featured cases found',
-            'featured_cases': featured_cases[:10],  # Limit to 10 featured cases
-            'total_featured': len(featured_cases),
-            'total_public': len(all_public_cases)
+            'featured_cases': featured_cases,
+            'total_featured': total_featured,
+            'total_public': total_public
         }), 200
 
     except Exception as e:
-        print(f"Error getting featured cases: {e}")
+        logger.error("❌ Error getting featured cases: %s", e)
         return jsonify({'error': 'Failed to get featured cases'}), 500
 
 
@@ -534,29 +566,32 @@ def download_case_pdf(case_id):
         return '', 200
 
     try:
-        # Get case details
-        case = get_case_by_id(case_id)
+        # Get case details (only the fields the report shows, so unrelated
+        # simulation data such as turns is not transferred)
+        case = get_case_by_id(case_id, REPORT_CASE_FIELDS)
         if not case:
             return jsonify({'error': 'Case not found'}), 404
 
-        # Get evidence for the case
-        evidence_list = list_evidences({'case_id': case_id})
+        # Get evidence for the case (only the fields the report shows)
+        evidence_list = list_evidences({'case_id': case_id}, REPORT_EVIDENCE_FIELDS)
 
-        # Generate PDF using the new service
-        buffer = generate_case_pdf(case, evidence_list)
+        # Reuse the rendered PDF while the case and its evidence are unchanged
+        pdf_path, cache_key = get_cached_case_pdf(case, evidence_list)
 
         # Prepare response
-        filename = f"case_report_{case_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
+        filename = f"case_report_{case_id}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.pdf"
 
         return send_file(
-            buffer,
+            pdf_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            conditional=True,
+            etag=cache_key
         )
 
     except Exception as e:
-        print(f"Error generating PDF: {e}")
+        logger.error("❌ Error generating PDF: %s", e)
         return jsonify({'error': 'Failed to generate PDF report'}), 500
 
 # Health check for cases
@@ -565,5 +600,5 @@ def cases_health_check():
     """Check if case service is working"""
     return jsonify({
         'status': 'Case service is running',
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.now(timezone.utc).isoformat()
     }), 200
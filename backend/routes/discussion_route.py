@@ -24,16 +24,14 @@ def get_discussions(case_id):
             auth_header = request.headers.get('Authorization')
             if not auth_header:
                 return jsonify({'error': 'Authentication required for private case discussions'}), 401
-            try:
-                token = auth_header.split(' ')[1]
-                payload = verify_token(token)
-                if not payload:
-                    return jsonify({'error': 'Invalid token'}), 401
-                user_id = payload.get('user_id')
-                if user_id != case.get('user_id'):
-                    return jsonify({'error': 'Access denied'}), 403
-            except IndexError:
+            if not auth_header.startswith('Bearer '):
                 return jsonify({'error': 'Invalid token format'}), 401
+            payload = verify_token(auth_header[7:])
+            if not payload:
+                return jsonify({'error': 'Invalid token'}), 401
+            user_id = payload.get('user_id')
+            if user_id != case.get('user_id'):
+                return jsonify({'error': 'Access denied'}), 403
 
         discussions = get_case_discussions(case_id)
 
@@ -103,10 +101,10 @@ def like_a_discussion(discussion_id):
         if not is_public and request.current_user_id != case.get('user_id'):
             return jsonify({'error': 'Access denied'}), 403
 
-        success = like_discussion(discussion_id)
+        likes = like_discussion(discussion_id)
 
-        if success:
-            return jsonify({'message': 'Discussion liked!'}), 200
+        if likes is not None:
+            return jsonify({'message': 'Discussion liked!', 'likes': likes}), 200
         else:
             return jsonify({'error': 'Failed to like discussion'}), 400
 
@@ -9,8 +9,9 @@ from typing import List, Dict, Any, Union, Tuple
 
 # Project imports - adjust paths if needed
 from model.case_model import get_case_by_id, update_case
-from model.evidence_model import list_evidences
+from model.evidence_model import get_evidence_by_id, list_evidences
 from services.parsing.document_parsing_services import master_parser
+from services.parsing.evidence_tasks import wait_for_evidence_parse
 
 # AI agents (local)
 from services.ai_services.ai_agents.prosecutor import ProsecutorAgent
@@ -101,6 +102,36 @@ def parse_simulation_into_turns(transcript: str) -> List[Dict[str, Any]]:
     return turns
 
 
+# How long a simulation waits for an upload's background parse to finish
+EVIDENCE_PARSE_WAIT_SECONDS = 120
+
+
+def _evidence_text(evidence: Dict[str, Any], case_id: str) -> Union[str, None]:
+    """Text for one evidence record, reusing what the upload's background parse
+    stored. Returns None when the evidence failed to parse or is still pending."""
+    if 'parsing_completed' not in evidence:
+        # Recorded before uploads were parsed in the background
+        parsed = master_parser(evidence.get("file_path"), use_multimodal_pdf=True, socketio=socketio, case_id=case_id)
+        # master_parser might return long string or dict
+        if isinstance(parsed, dict):
+            return parsed.get("text") or parsed.get("content") or str(parsed)
+        return str(parsed)
+
+    if not evidence.get('parsing_completed'):
+        was_pending, text = wait_for_evidence_parse(evidence.get("_id"), timeout=EVIDENCE_PARSE_WAIT_SECONDS)
+        if text is not None:
+            return text
+        if not was_pending:
+            # Finished since it was listed, or is being parsed by another worker
+            evidence = get_evidence_by_id(evidence["_id"]) or evidence
+        if not evidence.get('parsing_completed'):
+            return None
+
+    if evidence.get('parsing_error'):
+        return None
+    return evidence.get('parsed_content') or ''
+
+
 def analyze_case_evidence(case_id: str) -> Union[str, List[Dict[str, Any]]]:
     """Analyze and parse all evidence files for a case.
     Returns either a list of analyzed evidence dicts or an error string.
@@ -128,13 +159,10 @@ def analyze_case_evidence(case_id: str) -> Union[str, List[Dict[str, Any]]]:
                 'progress': progress
             }, room=case_id)
 
-            # master_parser might return long string or dict; keep a safe slice
-            parsed = master_parser(file_path, use_multimodal_pdf=True, socketio=socketio, case_id=case_id)
-            # Normalize parsed content into string
-            if isinstance(parsed, dict):
-                content_text = parsed.get("text") or parsed.get("content") or str(parsed)
-            else:
-                content_text = str(parsed)
+            content_text = _evidence_text(evidence, case_id)
+            if content_text is None:
+                print(f"⚠️ Skipping evidence that is not parsed: {title}")
+                continue
 
             analyzed_content.append(
                 {
@@ -10,8 +10,14 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from io import BytesIO
+from tempfile import SpooledTemporaryFile
 from datetime import datetime
+import glob
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache
 
 # Import the advanced transcript formatter
 try:
@@ -21,9 +27,22 @@ except ImportError:
     def format_transcript_for_pdf(transcript, **kwargs):
         return transcript.replace('\n', '<br/>')
 
+# Reports are built in memory up to this size, then spill to a temp file
+PDF_SPOOL_MAX_SIZE = 1024 * 1024
+
+# Rendered reports, one file per case version (see get_cached_case_pdf)
+PDF_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'cache', 'pdf')
+# Superseded reports are kept this long before being swept
+STALE_PDF_GRACE_SECONDS = 3600
+
 # --- Styling ---
+@lru_cache(maxsize=None)
 def get_custom_styles():
-    """Returns a dictionary of custom paragraph styles for the report."""
+    """Returns a dictionary of custom paragraph styles for the report.
+
+    Built on first use and then shared by every report, like the table
+    styles below; styles are only read while rendering.
+    """
     styles = getSampleStyleSheet()
     
     # Base font settings
@@ -100,6 +119,39 @@ def get_custom_styles():
 
     return styles
 
+# Table styles are fixed, so they are built once and shared between tables
+_CASE_INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1f2937')),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
+    ('PADDING', (0, 0), (-1, -1), 10),
+])
+
+_PARTIES_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#eff6ff')),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dbeafe')),
+    ('PADDING', (0, 0), (-1, -1), 10),
+])
+
+_EVIDENCE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
+])
+
+_TIMELINE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#eef2ff')),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dbeafe')),
+    ('PADDING', (0, 0), (-1, -1), 8),
+])
+
 # --- Page Template for Headers and Footers ---
 class PageTemplate(SimpleDocTemplate):
     """Custom document template to add headers and footers."""
@@ -145,15 +197,7 @@ def _add_case_information(content, styles, case_data):
     ]
     
     table = Table(case_info, colWidths=[1.5 * inch, 5 * inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1f2937')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-        ('PADDING', (0, 0), (-1, -1), 10),
-    ]))
+    table.setStyle(_CASE_INFO_TABLE_STYLE)
     content.append(table)
     content.append(Spacer(1, 0.4 * inch))
 
@@ -175,13 +219,7 @@ def _add_parties_involved(content, styles, case_data):
     ]
     
     table = Table(parties_info, colWidths=[1.5 * inch, 5 * inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#eff6ff')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dbeafe')),
-        ('PADDING', (0, 0), (-1, -1), 10),
-    ]))
+    table.setStyle(_PARTIES_TABLE_STYLE)
     content.append(table)
     content.append(Spacer(1, 0.4 * inch))
 
@@ -257,13 +295,7 @@ def _add_evidence_summary(content, styles, evidence_list):
             ])
 
         table = Table(evidence_data, colWidths=[0.4*inch, 2.5*inch, 1*inch, 1*inch, 1.1*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
-        ]))
+        table.setStyle(_EVIDENCE_TABLE_STYLE)
         content.append(table)
         content.append(Spacer(1, 0.4 * inch))
 
@@ -292,30 +324,16 @@ def _add_timeline_of_events(content, styles, evidence_list):
         timeline_data.append([date or 'N/A', Paragraph(title, styles['Normal'])])
 
     table = Table(timeline_data, colWidths=[1.5 * inch, 5 * inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#eef2ff')),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dbeafe')),
-        ('PADDING', (0, 0), (-1, -1), 8),
-    ]))
+    table.setStyle(_TIMELINE_TABLE_STYLE)
     content.append(table)
     content.append(Spacer(1, 0.4 * inch))
 
 # --- Main PDF Generation Function ---
-def generate_case_pdf(case_data, evidence_list):
-    """
-    Generates a comprehensive, multi-page PDF report for a given case.
-
-    Args:
-        case_data (dict): The case details.
-        evidence_list (list): A list of evidence associated with the case.
-
-    Returns:
-        BytesIO: A buffer containing the generated PDF.
-    """
-    buffer = BytesIO()
+def _build_case_pdf(output, case_data, evidence_list):
+    """Render the case report into a writable file object"""
     styles = get_custom_styles()
     
-    doc = PageTemplate(buffer, pagesize=letter, topMargin=inch, bottomMargin=inch)
+    doc = PageTemplate(output, pagesize=letter, topMargin=inch, bottomMargin=inch)
 
     content = []
 
@@ -336,5 +354,67 @@ def generate_case_pdf(case_data, evidence_list):
     _add_timeline_of_events(content, styles, evidence_list)
 
     doc.build(content)
+
+def generate_case_pdf(case_data, evidence_list):
+    """
+    Generates a comprehensive, multi-page PDF report for a given case.
+
+    Args:
+        case_data (dict): The case details.
+        evidence_list (list): A list of evidence associated with the case.
+
+    Returns:
+        SpooledTemporaryFile: The generated PDF, rewound to the start. Large
+        reports are spooled to disk rather than held in memory.
+    """
+    buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    _build_case_pdf(buffer, case_data, evidence_list)
     buffer.seek(0)
     return buffer
+
+def report_cache_key(case_data, evidence_list):
+    """Fingerprint of everything a report depends on: the case's last update
+    and each evidence item's ID and word count (which changes once parsed)"""
+    updated_at = case_data.get('updated_at')
+    parts = [case_data.get('case_id'), updated_at.isoformat() if hasattr(updated_at, 'isoformat') else updated_at]
+    parts += [f"{evidence.get('_id')}:{evidence.get('word_count', 0)}" for evidence in evidence_list]
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+def get_cached_case_pdf(case_data, evidence_list):
+    """
+    Returns the path of the case's PDF report, rendering it only when the case
+    or its evidence changed since the last download.
+
+    Returns:
+        tuple: (path to the PDF file, cache key usable as an ETag)
+    """
+    key = report_cache_key(case_data, evidence_list)
+    case_id = str(case_data.get('case_id'))
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    path = os.path.join(PDF_CACHE_DIR, f"{case_id}_{key}.pdf")
+
+    if not os.path.exists(path):
+        # Render to a private temp file and rename, so concurrent downloads
+        # never serve a half-written report
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as output:
+                _build_case_pdf(output, case_data, evidence_list)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # Reports for earlier versions of this case can never be served again.
+        # Only sweep ones untouched for a while: a concurrent request may have
+        # just resolved an older version and not opened it yet.
+        cutoff = time.time() - STALE_PDF_GRACE_SECONDS
+        for stale in glob.glob(os.path.join(PDF_CACHE_DIR, f"{glob.escape(case_id)}_*.pdf")):
+            if stale != path:
+                try:
+                    if os.path.getmtime(stale) < cutoff:
+                        os.remove(stale)
+                except OSError:
+                    pass
+
+    return path, key
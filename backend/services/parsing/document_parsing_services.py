@@ -34,6 +34,11 @@ logging.basicConfig(
 )
 
 class DocumentParser:
+    # Extensions handled by parse_document (keys of supported_extensions)
+    SUPPORTED_EXTENSIONS = frozenset({
+        '.pdf', '.docx', '.doc', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp', '.txt'
+    })
+
     def __init__(self, socketio=None, case_id=None):
         """Initialize the document parser with AI and OCR support"""
         # Lazy load OCR reader - only initialize when needed
@@ -89,13 +94,14 @@ class DocumentParser:
 
         self._ocr_initialized = True
     
-    def validate_file(self, file_path):
+    @staticmethod
+    def validate_file(file_path):
         """Validate if file exists and is supported"""
         if not os.path.exists(file_path):
             return False, f"File not found: {file_path}"
         
         ext = os.path.splitext(file_path)[1].lower()
-        if ext not in self.supported_extensions:
+        if ext not in DocumentParser.SUPPORTED_EXTENSIONS:
             return False, f"Unsupported file type: {ext}"
         
         # Check file size
@@ -106,11 +112,12 @@ class DocumentParser:
         
         return True, "File is valid"
     
-    def get_file_hash(self, file_path):
-        """Get MD5 hash of file for caching"""
+    @staticmethod
+    def get_file_hash(file_path):
+        """Get MD5 hash of file contents, used as the parse cache key"""
         hash_md5 = hashlib.md5()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(65536), b""):
                 hash_md5.update(chunk)
         return hash_md5.hexdigest()
     
@@ -417,7 +424,7 @@ class DocumentParser:
                 'extraction_method': 'failed'
             }
 
-    def parse_document(self, file_path, use_multimodal_pdf=True, cache_results=True):
+    def parse_document(self, file_path, use_multimodal_pdf=True, cache_results=True, file_hash=None):
         """Main parsing function with caching and validation"""
 
         # Validate file
@@ -431,7 +438,7 @@ class DocumentParser:
             'file_size': os.path.getsize(file_path),
             'file_extension': ext,
             'processed_at': datetime.utcnow().isoformat(),
-            'file_hash': self.get_file_hash(file_path)
+            'file_hash': file_hash or self.get_file_hash(file_path)
         }
 
         try:
@@ -593,10 +600,11 @@ class DocumentParser:
         except Exception as e:
             logging.warning(f"⚠️ Failed to cache result: {e}")
     
-    def get_cached_result(self, file_path):
+    @staticmethod
+    def get_cached_result(file_path, file_hash=None):
         """Get cached parsing result if available"""
         try:
-            file_hash = self.get_file_hash(file_path)
+            file_hash = file_hash or DocumentParser.get_file_hash(file_path)
             cache_file = os.path.join(os.path.dirname(__file__), '..', '..', 'cache', 'parsing', f"{file_hash}.json")
             
             if os.path.exists(cache_file):
@@ -626,17 +634,30 @@ def master_parser(file_path, use_multimodal_pdf=True, use_cache=True, socketio=N
     Returns:
         dict: Parsed content with metadata
     """
-    parser = DocumentParser(socketio=socketio, case_id=case_id)
-    # Check cache first
+    # Reject missing, unsupported or oversized files before hashing them
+    is_valid, message = DocumentParser.validate_file(file_path)
+    if not is_valid:
+        logging.error(f"❌ Parsing failed for {os.path.basename(file_path)}: {message}")
+        return {'error': message}
+
+    # Check cache first (keyed by content hash, so re-uploads of the same file
+    # hit it) before paying for parser/model setup
+    file_hash = None
     if use_cache:
-        cached_result = parser.get_cached_result(file_path)
+        try:
+            file_hash = DocumentParser.get_file_hash(file_path)
+        except OSError as e:
+            # Unreadable right now: treat as a cache miss and let parsing report it
+            logging.warning(f"⚠️ Failed to hash {os.path.basename(file_path)}: {e}")
+        cached_result = file_hash and DocumentParser.get_cached_result(file_path, file_hash)
         if cached_result:
             logging.info(f"📋 Using cached result for {os.path.basename(file_path)}")
             return cached_result
 
     # Parse document
+    parser = DocumentParser(socketio=socketio, case_id=case_id)
     logging.info(f"🔍 Starting parsing for {os.path.basename(file_path)}")
-    result = parser.parse_document(file_path, use_multimodal_pdf, use_cache)
+    result = parser.parse_document(file_path, use_multimodal_pdf, use_cache, file_hash)
 
     if 'error' in result:
         logging.error(f"❌ Parsing failed for {os.path.basename(file_path)}: {result['error']}")
@@ -0,0 +1,99 @@
+"""
+Background parsing of uploaded evidence
+
+Uploads are saved and recorded with parsing_completed=False, then parsed here
+off the request thread. The result is written back to the evidence document
+and announced to the case's SocketIO room as an 'evidence_parsed' event.
+Simulations use the stored text, waiting on a parse still running here
+rather than parsing the same file again.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from model.evidence_model import update_evidence
+from services.parsing.document_parsing_services import master_parser
+from socketio_instance import socketio
+
+logger = logging.getLogger("jurix.evidence_tasks")
+
+# Parsing is CPU/IO heavy (PDF, OCR), so only a couple run at once
+_parse_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="evidence-parse")
+
+# Parses queued or running in this process, by evidence ID
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def parse_evidence(evidence_id, case_id, file_path):
+    """Parse one evidence file and store the extracted text on its record
+
+    Returns:
+        str: The extracted text, or None if parsing failed
+    """
+    try:
+        parsed_result = master_parser(file_path, use_cache=True)
+
+        if isinstance(parsed_result, dict):
+            extracted_text = parsed_result.get('text', parsed_result.get('content', ''))
+            word_count = parsed_result.get('word_count', 0)
+            extraction_method = parsed_result.get('extraction_method', 'unknown')
+        else:
+            extracted_text = str(parsed_result)
+            word_count = len(extracted_text.split()) if extracted_text else 0
+            extraction_method = 'fallback'
+
+        update_evidence(evidence_id, {
+            'parsed_content': extracted_text,
+            'word_count': word_count,
+            'extraction_method': extraction_method,
+            'parsing_completed': True
+        })
+        logger.info("✅ Evidence %s parsed: %s words extracted using %s", evidence_id, word_count, extraction_method)
+        socketio.emit('evidence_parsed', {
+            'evidence_id': evidence_id,
+            'word_count': word_count,
+            'extraction_method': extraction_method,
+            'ready_for_simulation': True
+        }, room=case_id)
+        return extracted_text
+    except Exception as e:
+        logger.error("❌ Error parsing evidence %s: %s", evidence_id, e)
+        try:
+            update_evidence(evidence_id, {'parsing_completed': True, 'parsing_error': str(e)})
+        except Exception:
+            pass  # already logged by the model
+        socketio.emit('evidence_parsed', {'evidence_id': evidence_id, 'error': str(e)}, room=case_id)
+        return None
+
+
+def _forget_parse(evidence_id):
+    with _pending_lock:
+        _pending.pop(evidence_id, None)
+
+
+def submit_evidence_parse(evidence_id, case_id, file_path):
+    """Queue an evidence file for background parsing"""
+    with _pending_lock:
+        future = _parse_executor.submit(parse_evidence, evidence_id, case_id, file_path)
+        _pending[evidence_id] = future
+    future.add_done_callback(lambda _: _forget_parse(evidence_id))
+    return future
+
+
+def wait_for_evidence_parse(evidence_id, timeout=None):
+    """Block until this process's background parse of an evidence file ends
+
+    Returns:
+        tuple: (was_pending, extracted text or None if it failed or timed out)
+    """
+    with _pending_lock:
+        future = _pending.get(evidence_id)
+    if future is None:
+        return False, None
+    try:
+        return True, future.result(timeout=timeout)
+    except TimeoutError:
+        logger.warning("⚠️ Timed out waiting for evidence %s to be parsed", evidence_id)
+        return True, None
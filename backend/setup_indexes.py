@@ -1,44 +1,34 @@
 """
 Database Index Setup - Run this once
 python setup_indexes.py
+
+The index definitions live in db/indexes.py (the app also ensures them at
+startup); this script additionally drops indexes they make redundant.
 """
 
 from db.mongo import get_db
+from db.indexes import INDEXES, REDUNDANT_INDEXES
+
+def drop_index_if_exists(collection, name):
+    """Drop an index that a compound index now makes redundant"""
+    if name in collection.index_information():
+        collection.drop_index(name)
+        print(f"🗑️  Dropped redundant index {collection.name}.{name}")
 
 def setup_indexes():
     """Create indexes for better query performance"""
     db = get_db()
-    
+
     print("Creating indexes...")
-    
-    # Cases collection
-    cases = db['cases']
-    cases.create_index([("user_id", 1), ("created_at", -1)])
-    cases.create_index([("case_id", 1)], unique=True)
-    cases.create_index([("is_public", 1), ("created_at", -1)])
-    cases.create_index([("status", 1)])
-    print("✅ Cases indexes created")
-    
-    # Evidence collection
-    evidence = db['evidence']
-    evidence.create_index([("case_id", 1)])
-    evidence.create_index([("uploaded_at", -1)])
-    print("✅ Evidence indexes created")
-    
-    # Users collection
-    users = db['users']
-    users.create_index([("email", 1)], unique=True)
-    users.create_index([("created_at", -1)])
-    print("✅ User indexes created")
-    
-    # Discussions collection
-    discussions = db['discussions']
-    discussions.create_index([("case_id", 1), ("created_at", -1)])
-    discussions.create_index([("user_id", 1)])
-    print("✅ Discussion indexes created")
-    
-    print("
-🎉 All indexes created successfully!")
+
+    for name, indexes in INDEXES.items():
+        collection = db[name]
+        collection.create_indexes(indexes)
+        for index_name in REDUNDANT_INDEXES.get(name, []):
+            drop_index_if_exists(collection, index_name)
+        print(f"✅ {name.capitalize()} indexes created")
+
+    print("\n🎉 All indexes created successfully!")
 
 if __name__ == "__main__":
     setup_indexes()
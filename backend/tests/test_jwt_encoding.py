@@ -0,0 +1,69 @@
+"""
+Test Script: HS256 token encoding
+Checks that utils.helper.encode_hs256 produces tokens PyJWT accepts and
+that they are byte-for-byte what jwt.encode would produce
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+from utils.helper import encode_hs256
+
+KEY = b'test-key-with-enough-length-for-hs256-signing'
+
+def _payload(now):
+    return {
+        'user_id': '652f1c2e9b1e8a0012345678',
+        'email': 'lawyer@example.com',
+        'role': 'lawyer',
+        'iat': now,
+        'exp': now + timedelta(days=7)
+    }
+
+def test_round_trip_aware_datetimes():
+    """Timezone-aware exp/iat decode back to the same epoch seconds"""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    decoded = jwt.decode(encode_hs256(_payload(now), KEY), KEY, algorithms=['HS256'])
+    assert decoded['user_id'] == '652f1c2e9b1e8a0012345678'
+    assert decoded['iat'] == int(now.timestamp())
+    assert decoded['exp'] == int((now + timedelta(days=7)).timestamp())
+
+def test_round_trip_naive_datetimes():
+    """Naive exp/iat are treated as UTC, as PyJWT does"""
+    now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    decoded = jwt.decode(encode_hs256(_payload(now), KEY), KEY, algorithms=['HS256'])
+    assert decoded['exp'] == int(now.replace(tzinfo=timezone.utc).timestamp()) + 7 * 24 * 3600
+
+def test_matches_pyjwt():
+    """Same token as jwt.encode for aware, naive and integer claims"""
+    now = datetime.now(timezone.utc)
+    for payload in (_payload(now), _payload(now.replace(tzinfo=None)),
+                    {'user_id': 'abc', 'exp': int(now.timestamp()) + 60}):
+        assert encode_hs256(payload, KEY) == jwt.encode(payload, KEY, algorithm='HS256')
+
+def test_payload_not_mutated():
+    """The caller's datetimes are left in place"""
+    now = datetime.now(timezone.utc)
+    payload = _payload(now)
+    encode_hs256(payload, KEY)
+    assert payload['iat'] is now
+
+def test_wrong_key_rejected():
+    """A token signed with another key does not verify"""
+    token = encode_hs256(_payload(datetime.now(timezone.utc)), KEY)
+    try:
+        jwt.decode(token, b'another-key-of-sufficient-length-0000', algorithms=['HS256'])
+    except jwt.InvalidSignatureError:
+        return
+    raise AssertionError("token verified with the wrong key")
+
+if __name__ == "__main__":
+    for test in (test_round_trip_aware_datetimes, test_round_trip_naive_datetimes,
+                 test_matches_pyjwt, test_payload_not_mutated, test_wrong_key_rejected):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,167 @@
+"""
+In-process caching utilities
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+_MISSING = object()
+
+# Background reloads for ttl_memo entries that have gone stale
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+def _freeze(value):
+    """Turn dict/list arguments into hashable equivalents for cache keys"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class TTLCache:
+    """
+    Thread-safe mapping whose entries expire `ttl` seconds after being set,
+    holding at most `maxsize` entries (least recently used are evicted first).
+    """
+
+    def __init__(self, maxsize=256, ttl=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if missing/expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store `value` under `key`, optionally with a shorter/longer ttl"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove `key` and return its value (expired or not)"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def ttl_cache(ttl=10, maxsize=256):
+    """
+    Memoize a function's results for `ttl` seconds, keeping at most `maxsize`
+    entries (least recently used are evicted first).
+
+    Cached values are shared between callers, so they must not be mutated.
+    Use `func.cache_clear()` to drop all entries after a write.
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (_freeze(args), _freeze(kwargs))
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                cache.set(key, result)
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+def ttl_memo(ttl=300, maxsize=10000, stale_ttl=None):
+    """
+    Memoize a function with stale-while-revalidate semantics.
+
+    Results are fresh for `ttl` seconds. After that they are still returned
+    for up to `stale_ttl` more seconds (default: another `ttl`) while one
+    background thread reloads the entry, replacing rather than deleting it.
+    None results are never cached, so "not found" is always re-checked.
+
+    Cached values are shared between callers, so they must not be mutated.
+    Use `func.cache_pop(*args)` to invalidate one entry after a write; it
+    returns the value that was cached, if any.
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl + stale_ttl)
+        refreshing = set()
+        refreshing_lock = threading.Lock()
+        # Bumped on every invalidation so a load that raced a write is dropped
+        generation = [0]
+
+        def make_key(args, kwargs):
+            return (_freeze(args), _freeze(kwargs))
+
+        def load(key, args, kwargs):
+            started = generation[0]
+            result = func(*args, **kwargs)
+            if result is None:
+                cache.pop(key)
+            elif generation[0] == started:
+                cache.set(key, (time.monotonic() + ttl, result))
+            return result
+
+        def refresh(key, args, kwargs):
+            try:
+                load(key, args, kwargs)
+            except Exception:
+                pass  # keep serving the stale value until it expires
+            finally:
+                with refreshing_lock:
+                    refreshing.discard(key)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            entry = cache.get(key)
+            if entry is None:
+                return load(key, args, kwargs)
+
+            fresh_until, result = entry
+            if fresh_until <= time.monotonic():
+                with refreshing_lock:
+                    start = key not in refreshing
+                    refreshing.add(key)
+                if start:
+                    _refresh_executor.submit(refresh, key, args, kwargs)
+            return result
+
+        def cache_pop(*args, **kwargs):
+            generation[0] += 1
+            entry = cache.pop(make_key(args, kwargs))
+            return entry[1] if entry else None
+
+        def cache_clear():
+            generation[0] += 1
+            cache.clear()
+
+        wrapper.cache_pop = cache_pop
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
@@ -1,6 +1,17 @@
 from datetime import datetime
+import base64
 import hashlib
+import hmac
+import json
+import time
 import uuid
+from calendar import timegm
+
+# (epoch second, formatted string) of the last iso_now() call
+_iso_cache = [0, ""]
+
+# base64url of '{"alg":"HS256","typ":"JWT"}', the header PyJWT emits for HS256
+_HS256_HEADER = b'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9'
 
 def generate_case_id() -> str:
     """Generate unique case ID"""
@@ -16,6 +27,46 @@ def format_timestamp(dt: datetime = None) -> str:
         dt = datetime.utcnow()
     return dt.strftime('%Y-%m-%d %H:%M:%S UTC')
 
+def iso_now() -> str:
+    """Current UTC time as an ISO-8601 string, formatted at most once per second"""
+    t = int(time.time())
+    if t != _iso_cache[0]:
+        _iso_cache[1] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t))
+        _iso_cache[0] = t
+    return _iso_cache[1]
+
+def encode_cursor(created_at: datetime, doc_id) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps({'c': created_at.isoformat(), 'i': str(doc_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_cursor() into (created_at, id string)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data['c']), data['i']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {cursor}") from e
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+def encode_hs256(payload: dict, key: bytes) -> str:
+    """Same token as jwt.encode(payload, key, algorithm='HS256'), but with the
+    constant header pre-encoded so only the claims and signature are built"""
+    claims = payload.copy()
+    for claim in ('exp', 'iat', 'nbf'):
+        if isinstance(claims.get(claim), datetime):
+            claims[claim] = timegm(claims[claim].utctimetuple())
+    body = _b64url(json.dumps(claims, separators=(',', ':')).encode())
+    signing_input = _HS256_HEADER + b'.' + body
+    signature = _b64url(hmac.new(key, signing_input, hashlib.sha256).digest())
+    return (signing_input + b'.' + signature).decode()
+
 def calculate_file_hash(filepath: str) -> str:
     """Calculate SHA256 hash of file"""
     sha256_hash = hashlib.sha256()
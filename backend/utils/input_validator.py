@@ -1,6 +1,6 @@
-import re
 import html
 from typing import Dict, Any, List, Optional
+from utils.validators import EMAIL_PATTERN
 
 class InputValidator:
     """Input validation and sanitization utility"""
@@ -23,8 +23,7 @@ class InputValidator:
     @staticmethod
     def validate_email(email: str) -> bool:
         """Validate email format"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
+        return bool(EMAIL_PATTERN.match(email))
     
     @staticmethod
     def validate_case_data(data: Dict[str, Any]) -> tuple[bool, List[str]]:
@@ -0,0 +1,48 @@
+"""
+orjson-backed JSON provider for Flask
+"""
+
+import decimal
+from datetime import date
+
+import orjson
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+# Dates are passed through to _orjson_default so they keep Flask's RFC 1123
+# wire format; numpy arrays/scalars come back from the ML helpers; int keys
+# are coerced to strings like the stdlib encoder does. UUIDs and dataclasses
+# are encoded natively, with the same output as Flask's default provider.
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _orjson_default(o):
+    """Encode types orjson doesn't know natively (or is told to pass through)"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (ObjectId, decimal.Decimal)):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class ORJSONProvider(JSONProvider):
+    """
+    JSON provider that serializes with orjson, so every jsonify() call in the
+    app gets the faster encoder. Responses are built straight from orjson's
+    bytes instead of going through an intermediate str, and look the same as
+    with Flask's default provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS)
+        return self._app.response_class(body, mimetype="application/json")
@@ -1,7 +1,11 @@
 import jwt
+import logging
 import os
-import datetime
 import secrets
+from datetime import datetime, timedelta, timezone
+from utils.helper import encode_hs256
+
+logger = logging.getLogger("jurix.auth")
 
 # JWT Secret
 JWT_SECRET = os.getenv('JWT_SECRET') or 'your-secret-key-for-development-only'
@@ -24,18 +28,27 @@ def validate_jwt_secret():
 # Validate on import
 validate_jwt_secret()
 
-def generate_token(user_id, email):
-    """Generate JWT token for user"""
+# The secret never changes, so encode it once; aud/iss are never issued
+JWT_KEY = JWT_SECRET.encode()
+JWT_DECODE_OPTIONS = {'verify_aud': False, 'verify_iss': False, 'require': ['exp', 'user_id']}
+
+def generate_token(user_id, email, role=None, now=None):
+    """Generate JWT token for user (role is embedded so auth checks skip the DB)"""
+    if now is None:
+        now = datetime.now(timezone.utc)
     payload = {
         'user_id': str(user_id),
         'email': email,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
+        'exp': now + timedelta(days=7)
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
+    if role:
+        payload['role'] = role
+    return encode_hs256(payload, JWT_KEY)
 
 def verify_token(token):
     """Verify JWT token"""
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+        return jwt.decode(token, JWT_KEY, algorithms=['HS256'], options=JWT_DECODE_OPTIONS)
+    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
+        logger.debug("❌ Token verification failed: %s", e)
         return None
@@ -10,12 +10,12 @@ def track_performance(func):
     """Decorator to track function performance"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.time()
+        start = time.monotonic()
         func_name = func.__name__
         
         try:
             result = func(*args, **kwargs)
-            duration = time.time() - start
+            duration = time.monotonic() - start
             
             # Log slow operations
             if duration > 5.0:
@@ -25,7 +25,7 @@ def track_performance(func):
             
             return result
         except Exception as e:
-            duration = time.time() - start
+            duration = time.monotonic() - start
             logging.error(f"❌ ERROR in {func_name} after {duration:.2f}s: {e}")
             raise
     return wrapper
@@ -1,10 +1,22 @@
 import re
 from typing import Dict, List, Any
 
+# RE2 matches in linear time (no backtracking), so it is used when installed
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+EMAIL_PATTERN = (re2 if RE2_AVAILABLE else re).compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+def normalize_email(email: str) -> str:
+    """Canonical form used to store and look up emails"""
+    return email.strip().lower()
+
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 def validate_case_data(data: Dict) -> tuple[bool, List[str]]:
     """Validate case data"""